@@ -3,32 +3,66 @@ __revision__ = "$Format:%H$"
 
 import os
 import sys
-import tempfile
+import math
+import time
 import inspect
-import processing
-import codecs
+import collections
+import multiprocessing
+import multiprocessing.spawn
+
+import qgis.utils
 
 from tempfile import NamedTemporaryFile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
 from area_weighted_average.processing.config import PLUGIN_VERSION, REGISTRATION_FORM_ENRIES, REGISTRATION_FORM_LINK
 
 
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtCore import QCoreApplication, QThread, QTimer, QVariant, Qt
 from qgis.core import (
     QgsProcessing,
+    QgsSettings,
+    QgsMessageLog,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsGeometry,
     QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsExpression,
+    QgsAggregateCalculator,
+    QgsSpatialIndex,
+    QgsRectangle,
+    QgsRasterLayer,
+    QgsWkbTypes,
     QgsProcessingAlgorithm,
     QgsProcessingParameterFeatureSource,
     QgsProcessingParameterFeatureSink,
     QgsProcessingParameterVectorLayer,
+    QgsProcessingParameterRasterLayer,
+    QgsProcessingParameterBand,
     QgsProcessingParameterField,
     QgsProcessingParameterBoolean,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterMultipleLayers,
+    QgsProcessingParameterString,
+    QgsProcessingException,
     QgsProcessingMultiStepFeedback,
     QgsProcessingParameterDefinition,
     QgsProcessingParameterFileDestination,
-    QgsVectorFileWriter,
+    QgsProcessingUtils,
+    QgsProcessingContext,
+    QgsUnitTypes,
     QgsProcessingOutputHtml,
+    QgsProcessingOutputLayerDefinition,
     QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
 )
 
 from area_weighted_average.processing.utils import (
@@ -40,11 +74,231 @@ from area_weighted_average.processing.utils import (
 )
 
 from area_weighted_average.processing.registration import RegisterForm
+from area_weighted_average.processing.fragment_worker import (
+    clipPartition,
+    clipPieces,
+    geometryFromWkb,
+    groupAreas,
+    groupPieces,
+    polygonalPart,
+    removeSlivers,
+)
+from area_weighted_average.processing.fragment_cache import FragmentCache, layersFingerprint
+from area_weighted_average.processing.weight_matrix import WeightMatrixBuilder
+from area_weighted_average.processing.stage_profiler import StageProfiler
+from area_weighted_average.processing.raster_coverage import alignedWindow, coverageFractions, readWindow
+from area_weighted_average.processing.bulk_writer import BatchedSink, bulkWriter
+from area_weighted_average.processing.html_report import htmlReport
+from area_weighted_average.processing.area_measure import (
+    DistanceAreaMeasure,
+    EllipsoidalMeasure,
+    EqualAreaMeasure,
+)
+from area_weighted_average.processing.vector_backend import VectorOverlay, importShapely, weightedSums
 
 
 cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
 sys.path.append(cmd_folder)
 
+# number of buffered report rows after which the Fast Engine appends them to the HTML report
+HTML_FLUSH_ROWS = 50000
+
+# options of the Area Calculation parameter
+AREA_MODE_LAYER_CRS = 0
+AREA_MODE_EQUAL_AREA = 1
+AREA_MODE_ELLIPSOIDAL = 2
+
+# handling of the fragments below the sliver thresholds
+SLIVER_DROP = 0
+SLIVER_FOLD = 1
+
+# geometry backends of the Fast Engine, and the input features intersected at a time by the vectorized one
+BACKEND_QGIS = 0
+BACKEND_VECTORIZED = 1
+VECTOR_BLOCK_SIZE = 10000
+
+# no data value of the rasters burnt from the overlay in approximate mode
+RASTER_NODATA = -3.4e38
+
+# minimum time between two plugin version checks, in seconds
+VERSION_CHECK_INTERVAL = 24 * 60 * 60
+VERSION_CHECK_SETTING = "area_weighted_average/last_version_check"
+
+
+def queueVersionCheck():
+    """
+    Queue the plugin version check on the event loop of the main thread, which owns the plugin
+    installer data and iface, at most once per VERSION_CHECK_INTERVAL.
+    """
+    settings = QgsSettings()
+    if time.time() - settings.value(VERSION_CHECK_SETTING, 0, type=float) < VERSION_CHECK_INTERVAL:
+        return
+    settings.setValue(VERSION_CHECK_SETTING, time.time())
+
+    def run():
+        try:
+            checkPluginUptodate("Area Weighted Average")
+        except Exception as e:
+            QgsMessageLog.logMessage(f"Plugin version check failed. {e}", "Area Weighted Average")
+
+    QTimer.singleShot(0, run)
+
+
+def showPostRunMessages(counter):
+    """Usage message and registration form, run from the event loop once the results are handed over"""
+    try:
+        # check if counter is milestone for usage message
+        if counter % 25 == 0:
+            displayUsageMessage(counter)
+
+        # check if plugin is registered
+        if not getRegistrationStatus():
+            form = RegisterForm("Register Area Weighted Average", REGISTRATION_FORM_LINK, REGISTRATION_FORM_ENRIES)
+            form.show()
+    except Exception as e:
+        QgsMessageLog.logMessage(
+            f"Algorithm finished successfully but post processing failed. {e}", "Area Weighted Average"
+        )
+
+
+def setDestinationName(parameters, name, destination_name):
+    """Set the name of the layer loaded from a sink, sinks given as a plain path string have none"""
+    destination = parameters.get(name)
+    if isinstance(destination, QgsProcessingOutputLayerDefinition):
+        destination.destinationName = destination_name
+
+
+def pyValue(value):
+    """Convert a NULL QVariant attribute to None so it can be used in dictionary keys"""
+    if value is None or (isinstance(value, QVariant) and value.isNull()):
+        return None
+    return value
+
+
+def areaCalculator(crs, context):
+    """Return a function measuring areas the same way area($geometry) does inside processing"""
+    return DistanceAreaMeasure(crs, context)
+
+
+def areaMeasure(area_mode, layer, context):
+    """
+    Area measure of an Area Calculation mode for the geometries of layer. The equal-area and
+    ellipsoidal measures work on transformed copies and never change the context or the geometries.
+    """
+    if area_mode == AREA_MODE_EQUAL_AREA:
+        return EqualAreaMeasure(layer.crs(), equalAreaCrs(layer, context), context.transformContext())
+    if area_mode == AREA_MODE_ELLIPSOIDAL:
+        ellipsoid = context.ellipsoid()
+        if not ellipsoid or ellipsoid == "NONE":
+            ellipsoid = layer.crs().ellipsoidAcronym() or "EPSG:7030"
+        return EllipsoidalMeasure(layer.crs(), ellipsoid, context.transformContext())
+    return areaCalculator(layer.crs(), context)
+
+
+def planarAreas(crs, context):
+    """True if areaCalculator measures planar areas in the units of crs, as Shapely does"""
+    if context.ellipsoid() and context.ellipsoid() != "NONE":
+        return False
+    if hasattr(context, "areaUnit"):
+        return context.areaUnit() == QgsUnitTypes.distanceToAreaUnit(crs.mapUnits())
+    return True
+
+
+def equalAreaCrs(layer, context):
+    """Lambert azimuthal equal-area CRS centred on the extent of a layer"""
+    wgs84 = QgsCoordinateReferenceSystem("EPSG:4326")
+    transform = QgsCoordinateTransform(layer.crs(), wgs84, context.transformContext())
+    center = transform.transformBoundingBox(layer.extent()).center()
+    return QgsCoordinateReferenceSystem.fromProj(
+        f"+proj=laea +lat_0={center.y():.6f} +lon_0={center.x():.6f} +x_0=0 +y_0=0 +datum=WGS84 +units=m +no_defs"
+    )
+
+
+def pythonExecutable():
+    """
+    Python interpreter for worker processes. Inside QGIS sys.executable is usually the QGIS binary,
+    which cannot run them, so QgsProcessingException is raised if no interpreter is found.
+    """
+    if os.path.basename(sys.executable).lower().startswith("python"):
+        return sys.executable
+    for folder in (os.path.dirname(sys.executable), os.path.join(sys.exec_prefix, "bin"), sys.exec_prefix):
+        for name in ("python3.exe", "python.exe", "python3"):
+            candidate = os.path.join(folder, name)
+            if os.path.isfile(candidate):
+                return candidate
+    raise QgsProcessingException(
+        f"No Python interpreter found next to {sys.executable} for the worker processes, set Worker Processes to 1"
+    )
+
+
+def dataFrameType(field):
+    """Pandas dtype used for a QgsField when building report tables"""
+    if field.type() in (QVariant.Int, QVariant.UInt, QVariant.LongLong, QVariant.ULongLong):
+        return "Int64"
+    if field.type() == QVariant.Double:
+        return "float64"
+    if field.type() == QVariant.Bool:
+        return "boolean"
+    return "object"
+
+
+def layerToDataFrame(pd, layer, field_names=None, chunk_size=50000, feedback=None):
+    """
+    Read the attribute table of a layer straight into a DataFrame, without geometries and without
+    a text round-trip. Each column keeps the type of its field and features are read in chunks.
+    """
+    chunks = list(layerDataFrames(pd, layer, field_names, chunk_size, feedback))
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def layerDataFrames(pd, layer, field_names=None, chunk_size=50000, feedback=None, group_field=None):
+    """
+    Read the attribute table of a layer as DataFrames of about chunk_size rows, at least one. If
+    group_field is given, features are read ordered by it and the rows of a group are never split
+    across DataFrames.
+    """
+    fields = [field for field in layer.fields() if field_names is None or field.name() in field_names]
+    names = [field.name() for field in fields]
+    dtypes = [dataFrameType(field) for field in fields]
+
+    request = QgsFeatureRequest()
+    request.setFlags(QgsFeatureRequest.NoGeometry)
+    request.setSubsetOfAttributes(names, layer.fields())
+    indices = [layer.fields().lookupField(name) for name in names]
+    group_column = None
+    if group_field is not None:
+        request.addOrderBy(QgsExpression.quotedColumnRef(group_field))
+        group_column = names.index(group_field)
+
+    def toFrame(columns):
+        return pd.DataFrame(
+            {name: pd.Series(values, dtype=dtype) for name, dtype, values in zip(names, dtypes, columns)},
+            columns=names,
+        )
+
+    yielded = False
+    columns = [[] for _ in names]
+    for feat in layer.getFeatures(request):
+        if feedback is not None and feedback.isCanceled():
+            break
+        attributes = feat.attributes()
+        row = []
+        for index in indices:
+            value = pyValue(attributes[index])
+            if hasattr(value, "toString"):  # QDate, QTime, QDateTime
+                value = value.toString(Qt.ISODate)
+            row.append(value)
+        # a full chunk is only cut where a new group starts
+        if len(columns[0]) >= chunk_size and (group_column is None or row[group_column] != columns[group_column][-1]):
+            yield toFrame(columns)
+            yielded = True
+            columns = [[] for _ in names]
+        for column, value in zip(columns, row):
+            column.append(value)
+
+    if not yielded or columns[0]:
+        yield toFrame(columns)
+
 
 class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
     """ """
@@ -70,6 +324,7 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
                 "overlaylayer",
                 "Overlay Layer (Data Source)",
                 types=[QgsProcessing.TypeVectorPolygon],
+                optional=True,
                 defaultValue=None,
             )
         )
@@ -92,7 +347,8 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
                 "Field to Average",
                 type=QgsProcessingParameterField.Numeric,
                 parentLayerParameterName="overlaylayer",
-                allowMultiple=False,
+                allowMultiple=True,
+                optional=True,
                 defaultValue=None,
             )
         )
@@ -108,6 +364,202 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
         param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
         self.addParameter(param)
 
+        param = QgsProcessingParameterMultipleLayers(
+            "additionaloverlays",
+            "Additional Overlay Layers (Fast Engine)",
+            layerType=QgsProcessing.TypeVectorPolygon,
+            optional=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterString(
+            "additionaloverlayfields",
+            "Field to Average of each Additional Overlay Layer (separated by ;)",
+            optional=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterBoolean(
+            "fastengine",
+            "Fast Engine (single pass, no intermediate layers)",
+            optional=True,
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterEnum(
+            "areamode",
+            "Area Calculation",
+            options=[
+                "Layer CRS",
+                "Equal-area CRS (Fast Engine)",
+                "Ellipsoidal areas (Fast Engine)",
+            ],
+            optional=True,
+            defaultValue=AREA_MODE_LAYER_CRS,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "sliverarea",
+            "Minimum Fragment Area (area units)",
+            type=QgsProcessingParameterNumber.Double,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "sliverpercent",
+            "Minimum Fragment Percentage of Input Feature Area",
+            type=QgsProcessingParameterNumber.Double,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+            maxValue=100,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterEnum(
+            "sliverhandling",
+            "Sliver Fragments",
+            options=["Drop", "Fold into the largest fragment (Fast Engine)"],
+            optional=True,
+            defaultValue=SLIVER_DROP,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "approxcellsize",
+            "Approximate Mode Cell Size (Overlay Layer units)",
+            type=QgsProcessingParameterNumber.Double,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterRasterLayer(
+            "overlayraster",
+            "Overlay Raster (Approximate Mode)",
+            optional=True,
+            defaultValue=None,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterBand(
+            "rasterbands",
+            "Raster Bands to Average",
+            None,
+            "overlayraster",
+            optional=True,
+            allowMultiple=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterVectorLayer(
+            "previousresult",
+            "Previous Result (Incremental Mode)",
+            types=[QgsProcessing.TypeVectorPolygon],
+            optional=True,
+            defaultValue=None,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterVectorLayer(
+            "previousreport",
+            "Previous Report as Layer (Incremental Mode)",
+            types=[QgsProcessing.TypeVectorPolygon],
+            optional=True,
+            defaultValue=None,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterFile(
+            "fragmentcache",
+            "Intersection Cache Folder (Fast Engine)",
+            behavior=QgsProcessingParameterFile.Folder,
+            optional=True,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "cachesize",
+            "Intersection Cache Size Limit (MB)",
+            type=QgsProcessingParameterNumber.Integer,
+            optional=True,
+            defaultValue=2048,
+            minValue=1,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterEnum(
+            "geometrybackend",
+            "Geometry Backend (Fast Engine)",
+            options=["QGIS", "Shapely 2 / NumPy (vectorized)"],
+            optional=True,
+            defaultValue=BACKEND_QGIS,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "workers",
+            "Worker Processes (Fast Engine)",
+            type=QgsProcessingParameterNumber.Integer,
+            optional=True,
+            defaultValue=1,
+            minValue=1,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "writebatchsize",
+            "Bulk Output Batch Size (Fast Engine)",
+            type=QgsProcessingParameterNumber.Integer,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterNumber(
+            "chunksize",
+            "Streaming Chunk Size (Fast Engine)",
+            type=QgsProcessingParameterNumber.Integer,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterBoolean(
+            "compactreport",
+            "Report as Attribute Table (no geometry)",
+            optional=True,
+            defaultValue=False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
         self.addParameter(
             QgsProcessingParameterFeatureSink(
                 "result",
@@ -137,39 +589,118 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        param = QgsProcessingParameterNumber(
+            "htmlpagesize",
+            "Report as HTML Features per Page",
+            type=QgsProcessingParameterNumber.Integer,
+            optional=True,
+            defaultValue=0,
+            minValue=0,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterFileDestination(
+            "weightmatrix",
+            self.tr("Areal Weight Matrix (Fast Engine)"),
+            self.tr("NumPy archives (*.npz)"),
+            None,
+            True,
+            False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
+        param = QgsProcessingParameterFileDestination(
+            "profile",
+            self.tr("Stage Profile"),
+            self.tr("JSON files (*.json)"),
+            None,
+            True,
+            False,
+        )
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(param)
+
     def processAlgorithm(self, parameters, context, model_feedback):
         # Use a multi-step feedback, so that individual child algorithm progress reports are adjusted for the
         # overall progress through the model
-        feedback = QgsProcessingMultiStepFeedback(13, model_feedback)
+        fields_to_average = self.parameterAsFields(parameters, "fieldtoaverage", context)
+        additional_fields = [
+            field
+            for field in self.parameterAsFields(parameters, "additionalfields", context)
+            if field not in fields_to_average
+        ]
+        weighted_fields = ["weighted_" + field for field in fields_to_average]
+        weight_steps = len(fields_to_average)
+
+        feedback = QgsProcessingMultiStepFeedback(11 + weight_steps, model_feedback)
         results = {}
         outputs = {}
 
+        # per-stage instrumentation, vertices are only counted when the profile is saved
+        profile_file = self.parameterAsFileOutput(parameters, "profile", context)
+        profiler = StageProfiler(context, count_vertices=bool(profile_file))
+
         input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
         overlay_layer = self.parameterAsVectorLayer(parameters, "overlaylayer", context)
 
+        # approximate mode works on a raster overlay, given or rasterized from the Overlay Layer
+        if (
+            self.parameterAsRasterLayer(parameters, "overlayraster", context) is not None
+            or self.parameterAsDouble(parameters, "approxcellsize", context) > 0
+        ):
+            return self.processApproximate(parameters, context, model_feedback, profiler)
+        if overlay_layer is None or not fields_to_average:
+            raise QgsProcessingException("An Overlay Layer and a Field to Average, or an Overlay Raster, are required.")
+
+        # equal-area and ellipsoidal areas are measured by the Fast Engine, the outputs stay in the input CRS
+        area_mode = self.parameterAsEnum(parameters, "areamode", context)
+
         input_epsg_code = input_layer.crs().authid()
         overlay_epsg_code = overlay_layer.crs().authid()
 
         crs_input = QgsCoordinateReferenceSystem(input_epsg_code)
         crs_overlay = QgsCoordinateReferenceSystem(overlay_epsg_code)
 
-        if crs_input.isGeographic():
-            feedback.reportError(
-                "CRS of the Input Layer is Geographic. Results accuracy may get impacted. For most accurate results, both input and overlay layers should be in the same Projected CRS\n"
-            )
+        # the geographic CRS warnings only apply to areas measured in the layer CRS
+        if area_mode == AREA_MODE_LAYER_CRS:
+            if crs_input.isGeographic():
+                feedback.reportError(
+                    "CRS of the Input Layer is Geographic. Results accuracy may get impacted. For most accurate results, both input and overlay layers should be in the same Projected CRS, or use an equal-area or ellipsoidal Area Calculation\n"
+                )
 
-        if crs_overlay.isGeographic():
-            feedback.reportError(
-                "CRS of the Input Layer is Geographic. Results accuracy may get impacted. For most accurate results, both input and overlay layers should be in the same Projected CRS\n"
-            )
+            if crs_overlay.isGeographic():
+                feedback.reportError(
+                    "CRS of the Input Layer is Geographic. Results accuracy may get impacted. For most accurate results, both input and overlay layers should be in the same Projected CRS, or use an equal-area or ellipsoidal Area Calculation\n"
+                )
 
-        if input_epsg_code == overlay_epsg_code:
+        if input_epsg_code == overlay_epsg_code or area_mode != AREA_MODE_LAYER_CRS:
             pass
         else:
             feedback.reportError(
                 "Input and Overlay Layers are in different CRS. For most accurate results, both input and overlay layers should be in the same Projected CRS\n"
             )
 
+        sliver_area = self.parameterAsDouble(parameters, "sliverarea", context)
+        sliver_percent = self.parameterAsDouble(parameters, "sliverpercent", context)
+        sliver_threshold = sliver_area > 0 or sliver_percent > 0
+        fast_engine = (
+            self.parameterAsBool(parameters, "fastengine", context)
+            or self.parameterAsInt(parameters, "workers", context) > 1
+            or bool(self.parameterAsLayerList(parameters, "additionaloverlays", context))
+            or self.parameterAsEnum(parameters, "geometrybackend", context) == BACKEND_VECTORIZED
+            or self.parameterAsInt(parameters, "chunksize", context) > 0
+            or self.parameterAsInt(parameters, "writebatchsize", context) > 0
+            or bool(self.parameterAsString(parameters, "fragmentcache", context))
+            or self.parameterAsVectorLayer(parameters, "previousresult", context) is not None
+            or bool(self.parameterAsFileOutput(parameters, "weightmatrix", context))
+            or area_mode != AREA_MODE_LAYER_CRS
+            or (sliver_threshold and self.parameterAsEnum(parameters, "sliverhandling", context) == SLIVER_FOLD)
+        )
+        if fast_engine:
+            return self.processFastEngine(parameters, context, model_feedback, profiler)
+
         # add_ID_field to input layer
         alg_params = {
             "FIELD_NAME": "input_feat_id",
@@ -181,12 +712,8 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "START": 1,
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["Add_id_field"] = processing.run(
-            "native:addautoincrementalfield",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
+        outputs["Add_id_field"] = profiler.run(
+            "Add ID field", "native:addautoincrementalfield", alg_params, context, feedback
         )
 
         feedback.setCurrentStep(1)
@@ -203,34 +730,20 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "INPUT": outputs["Add_id_field"]["OUTPUT"],
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["Add_area_field"] = processing.run(
-            "qgis:fieldcalculator",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
+        outputs["Add_area_field"] = profiler.run(
+            "Add area field", "qgis:fieldcalculator", alg_params, context, feedback
         )
 
         feedback.setCurrentStep(2)
         if feedback.isCanceled():
             return {}
 
-        # dissolve all overlay fields so as not to repeat record in reporting
-        alg_params = {
-            "FIELD": [parameters["fieldtoaverage"]]
-            + [field for field in parameters["additionalfields"] if field != str(parameters["fieldtoaverage"])],
-            "INPUT": parameters["overlaylayer"],
-            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        outputs["Dissolve"] = processing.run(
-            "native:dissolve",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
-
-        feedback.setCurrentStep(3)
+        # keep only overlay features that can touch the input layer
+        with profiler.stage("Overlay prefilter", overlay_layer) as stage:
+            overlay_source = self.prefilterOverlay(input_layer, overlay_layer, context, feedback)
+            stage.setOutput(overlay_source)
+        if overlay_source is None:
+            overlay_source = parameters["overlaylayer"]
         if feedback.isCanceled():
             return {}
 
@@ -240,108 +753,95 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
         alg_params = {
             "INPUT": outputs["Add_area_field"]["OUTPUT"],
             "INPUT_FIELDS": [""],
-            "OVERLAY": outputs["Dissolve"]["OUTPUT"],
-            "OVERLAY_FIELDS": [str(parameters["fieldtoaverage"])] + parameters["additionalfields"],
+            "OVERLAY": overlay_source,
+            "OVERLAY_FIELDS": fields_to_average + additional_fields,
             "OVERLAY_FIELDS_PREFIX": "",
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["Intersection"] = processing.run(
-            "native:intersection",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
-
-        feedback.setCurrentStep(4)
-        if feedback.isCanceled():
-            return {}
+        outputs["Intersection"] = profiler.run("Intersection", "native:intersection", alg_params, context, feedback)
 
-        # add_Weight
-        alg_params = {
-            "FIELD_LENGTH": 0,
-            "FIELD_NAME": parameters["fieldtoaverage"] + "_area",
-            "FIELD_PRECISION": 0,
-            "FIELD_TYPE": 0,
-            "FORMULA": ' "' + parameters["fieldtoaverage"] + '"  *  area($geometry)',
-            "INPUT": outputs["Intersection"]["OUTPUT"],
-            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        outputs["Add_Weight"] = processing.run(
-            "qgis:fieldcalculator",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        # drop the sliver fragments before any later step carries them
+        if sliver_threshold:
+            alg_params = {
+                "EXPRESSION": (
+                    f"area($geometry) >= {sliver_area:.15f}"
+                    f' AND area($geometry) * 100 >= {sliver_percent:.15f} * "area_awa"'
+                ),
+                "INPUT": outputs["Intersection"]["OUTPUT"],
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                "FAIL_OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            }
+            outputs["Intersection"] = profiler.run(
+                "Drop sliver fragments", "native:extractbyexpression", alg_params, context, feedback
+            )
+            slivers_layer = QgsProcessingUtils.mapLayerFromString(outputs["Intersection"]["FAIL_OUTPUT"], context)
+            input_areas = QgsProcessingUtils.mapLayerFromString(outputs["Add_area_field"]["OUTPUT"], context)
+            measure_area = areaCalculator(slivers_layer.crs(), context)
+            self.reportSlivers(
+                feedback,
+                slivers_layer.featureCount(),
+                sum(measure_area(feat.geometry()) for feat in slivers_layer.getFeatures()),
+                input_areas.aggregate(QgsAggregateCalculator.Sum, "area_awa")[0],
+                fold=False,
+            )
 
-        feedback.setCurrentStep(5)
+        feedback.setCurrentStep(3)
         if feedback.isCanceled():
             return {}
 
-        # area_average
-        weighted_field = "weighted_" + parameters["fieldtoaverage"]
-        alg_params = {
-            "FIELD_LENGTH": 0,
-            "FIELD_NAME": weighted_field,
-            "FIELD_PRECISION": 0,
-            "FIELD_TYPE": 0,
-            "FORMULA": ' sum("' + parameters["fieldtoaverage"] + "_area" '","input_feat_id")/"area_awa"',
-            "INPUT": outputs["Add_Weight"]["OUTPUT"],
-            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
-        }
-        outputs["area_average"] = processing.run(
-            "qgis:fieldcalculator",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        # area_average, one weighted field per field to average, all sharing the intersection
+        outputs["area_average"] = outputs["Intersection"]
+        for step, (field, weighted_field) in enumerate(zip(fields_to_average, weighted_fields), start=4):
+            alg_params = {
+                "FIELD_LENGTH": 0,
+                "FIELD_NAME": weighted_field,
+                "FIELD_PRECISION": 0,
+                "FIELD_TYPE": 0,
+                "FORMULA": ' sum("' + field + '"  *  area($geometry),"input_feat_id")/"area_awa"',
+                "INPUT": outputs["area_average"]["OUTPUT"],
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            }
+            outputs["area_average"] = profiler.run(
+                f"Area average {field}", "qgis:fieldcalculator", alg_params, context, feedback
+            )
 
-        feedback.setCurrentStep(6)
-        if feedback.isCanceled():
-            return {}
+            feedback.setCurrentStep(step)
+            if feedback.isCanceled():
+                return {}
 
-        # remerge input layer elements
+        # attach weighted values to the original input features, features missing every overlay get NULL
         alg_params = {
-            "FIELD": ["input_feat_id"],
-            "INPUT": outputs["area_average"]["OUTPUT"],
+            "DISCARD_NONMATCHING": False,
+            "FIELD": "input_feat_id",
+            "FIELDS_TO_COPY": weighted_fields,
+            "FIELD_2": "input_feat_id",
+            "INPUT": outputs["Add_area_field"]["OUTPUT"],
+            "INPUT_2": outputs["area_average"]["OUTPUT"],
+            "METHOD": 1,
+            "PREFIX": "",
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["Dissolve2"] = processing.run(
-            "native:dissolve",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
+        outputs["Join_weighted"] = profiler.run(
+            "Join weighted values", "native:joinattributestable", alg_params, context, feedback
         )
 
-        feedback.setCurrentStep(7)
+        feedback.setCurrentStep(4 + weight_steps)
         if feedback.isCanceled():
             return {}
 
         input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
-        result_name = input_layer.name() + "_" + parameters["fieldtoaverage"]
-        parameters["result"].destinationName = result_name
+        result_name = input_layer.name() + "_" + "_".join(fields_to_average)
+        setDestinationName(parameters, "result", result_name)
 
         # drop field(s) for Result
         alg_params = {
-            "COLUMN": ["input_feat_id", "area_awa"]
-            + [parameters["fieldtoaverage"]]
-            + [field for field in parameters["additionalfields"] if field != str(parameters["fieldtoaverage"])]
-            + [parameters["fieldtoaverage"] + "_area"],
-            "INPUT": outputs["Dissolve2"]["OUTPUT"],
+            "COLUMN": ["input_feat_id", "area_awa"],
+            "INPUT": outputs["Join_weighted"]["OUTPUT"],
             "OUTPUT": parameters["result"],
         }
-        outputs["Drop1"] = processing.run(
-            "qgis:deletecolumn",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        outputs["Drop1"] = profiler.run("Drop fields (Result)", "qgis:deletecolumn", alg_params, context, feedback)
 
-        feedback.setCurrentStep(8)
+        feedback.setCurrentStep(5 + weight_steps)
         if feedback.isCanceled():
             return {}
 
@@ -353,9 +853,10 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
         int_layer = context.takeResultLayer(outputs["area_average"]["OUTPUT"])
         all_fields = [f.name() for f in int_layer.fields()]
         fields_to_keep = (
-            ["input_feat_id", weighted_field]
-            + [field for field in parameters["additionalfields"] if field != str(parameters["fieldtoaverage"])]
-            + [parameters["fieldtoaverage"]]
+            ["input_feat_id"]
+            + weighted_fields
+            + additional_fields
+            + fields_to_average
             + [parameters["identifierfieldforreport"]]
         )
         fields_to_drop = [f for f in all_fields if f not in fields_to_keep]
@@ -364,15 +865,43 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "INPUT": int_layer,
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["Drop2"] = processing.run(
-            "qgis:deletecolumn",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        outputs["Drop2"] = profiler.run("Drop fields (Report)", "qgis:deletecolumn", alg_params, context, feedback)
 
-        feedback.setCurrentStep(9)
+        feedback.setCurrentStep(6 + weight_steps)
+        if feedback.isCanceled():
+            return {}
+
+        setDestinationName(parameters, "reportaslayer", "Report as Layer")
+        if self.parameterAsBool(parameters, "compactreport", context):
+            # attribute table only: fragment areas are summed in one pass, no geometry is collected
+            with profiler.stage("Compact report", outputs["Drop2"]["OUTPUT"]) as stage:
+                report_id = self.writeCompactReport(
+                    parameters,
+                    outputs["Drop2"]["OUTPUT"],
+                    parameters["identifierfieldforreport"],
+                    fields_to_average + additional_fields,
+                    weighted_fields,
+                    context,
+                )
+                stage.setOutput(report_id)
+            feedback.setCurrentStep(10 + weight_steps)
+            if feedback.isCanceled():
+                return {}
+            results["reportaslayer"] = report_id
+            return self.writeChainHtmlReport(
+                parameters, report_id, weighted_fields, results, context, feedback, profiler, model_feedback
+            )
+
+        # group fragments by input feature and overlay fields so as not to repeat record in reporting,
+        # parts are only collected, overlay geometries are never dissolved
+        alg_params = {
+            "FIELD": ["input_feat_id"] + fields_to_average + additional_fields,
+            "INPUT": outputs["Drop2"]["OUTPUT"],
+            "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+        }
+        outputs["Collect"] = profiler.run("Collect", "native:collect", alg_params, context, feedback)
+
+        feedback.setCurrentStep(7 + weight_steps)
         if feedback.isCanceled():
             return {}
 
@@ -383,22 +912,15 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "FIELD_PRECISION": 5,
             "FIELD_TYPE": 0,
             "FORMULA": "round(area($geometry),5)",
-            "INPUT": outputs["Drop2"]["OUTPUT"],
+            "INPUT": outputs["Collect"]["OUTPUT"],
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["update_area"] = processing.run(
-            "qgis:fieldcalculator",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        outputs["update_area"] = profiler.run("Update area", "qgis:fieldcalculator", alg_params, context, feedback)
 
-        feedback.setCurrentStep(10)
+        feedback.setCurrentStep(8 + weight_steps)
         if feedback.isCanceled():
             return {}
 
-        parameters["reportaslayer"].destinationName = "Report as Layer"
         # add area %
         alg_params = {
             "FIELD_LENGTH": 9,
@@ -409,15 +931,9 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "INPUT": outputs["update_area"]["OUTPUT"],
             "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
         }
-        outputs["area_prcnt"] = processing.run(
-            "qgis:fieldcalculator",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
-        )
+        outputs["area_prcnt"] = profiler.run("Area percentage", "qgis:fieldcalculator", alg_params, context, feedback)
 
-        feedback.setCurrentStep(11)
+        feedback.setCurrentStep(9 + weight_steps)
         if feedback.isCanceled():
             return {}
 
@@ -429,111 +945,1127 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
             "NULLS_FIRST": False,
             "OUTPUT": parameters["reportaslayer"],
         }
-        outputs["OrderByExpression"] = processing.run(
-            "native:orderbyexpression",
-            alg_params,
-            context=context,
-            feedback=feedback,
-            is_child_algorithm=True,
+        outputs["OrderByExpression"] = profiler.run(
+            "Order by expression", "native:orderbyexpression", alg_params, context, feedback
         )
 
-        feedback.setCurrentStep(12)
+        feedback.setCurrentStep(10 + weight_steps)
         if feedback.isCanceled():
             return {}
 
         results["reportaslayer"] = outputs["OrderByExpression"]["OUTPUT"]
 
+        report_id = outputs["area_prcnt"]["OUTPUT"]
+        return self.writeChainHtmlReport(
+            parameters, report_id, weighted_fields, results, context, feedback, profiler, model_feedback
+        )
+
+    def writeChainHtmlReport(
+        self, parameters, report_id, weighted_fields, results, context, feedback, profiler, model_feedback
+    ):
+        """
+        Write the HTML report of the processing chain from the report layer, if requested, and
+        finish the run.
+        """
+        profile_file = self.parameterAsFileOutput(parameters, "profile", context)
         output_file = self.parameterAsFileOutput(parameters, "reportasHTML", context)
 
         # create HTML report
         if output_file:
+            pd = self.importPandas(feedback)
+            if pd is None:
+                return self.finishProfile(profiler, profile_file, results, model_feedback)
+
+            ident_name = parameters["identifierfieldforreport"]
+            page_size = self.parameterAsInt(parameters, "htmlpagesize", context)
+            report_layer = QgsProcessingUtils.mapLayerFromString(report_id, context)
+            if page_size > 0:
+                # paged report: the table is read ordered by input feature, a chunk at a time; the memory
+                # layers of the chain are sorted whole by QGIS first, only the Fast Engine streams its pages
+                with profiler.stage("HTML report", report_id):
+                    dfs = layerDataFrames(pd, report_layer, feedback=feedback, group_field="input_feat_id")
+                    self.writeHtmlReport(pd, dfs, output_file, ident_name, weighted_fields, page_size)
+                feedback.setCurrentStep(11 + len(weighted_fields))
+            else:
+                # read the report attributes straight into typed columns
+                with profiler.stage("Read report table", report_id):
+                    df = layerToDataFrame(pd, report_layer, feedback=feedback)
+
+                feedback.setCurrentStep(11 + len(weighted_fields))
+                if feedback.isCanceled():
+                    return {}
+
+                with profiler.stage("HTML report"):
+                    self.writeHtmlReport(pd, [df], output_file, ident_name, weighted_fields)
+            if feedback.isCanceled():
+                return {}
+            results["reportasHTML"] = output_file
+
+        return self.finishProfile(profiler, profile_file, results, model_feedback)
+
+    def reportSlivers(self, feedback, count, area, input_area, fold):
+        """
+        Log the number of sliver fragments and the share of the Input Layer area they account for.
+        """
+        action = "folded into the largest fragment of their input feature" if fold else "dropped"
+        share = f", {area * 100 / input_area:.5f} % of the Input Layer area" if input_area else ""
+        feedback.pushInfo(f"{count} sliver fragment(s) {action}: {area:.5f} area units{share}\n")
+
+    def finishProfile(self, profiler, profile_file, results, feedback):
+        """
+        Log the per-stage summary and, if requested, save it as JSON.
+        """
+        feedback.pushInfo("Stage profile:")
+        for line in profiler.summary():
+            feedback.pushInfo(line)
+        if profile_file:
+            profiler.save(profile_file)
+            results["profile"] = profile_file
+        return results
+
+    def prefilterOverlay(self, input_layer, overlay_layer, context, feedback):
+        """
+        Index the overlay layer and keep only the features whose bounding box hits the bounding box
+        of an input feature. Returns a memory layer with that subset, or None if nothing is pruned.
+        """
+        overlay_index = QgsSpatialIndex(overlay_layer.getFeatures(QgsFeatureRequest().setNoAttributes()), feedback)
+
+        request = QgsFeatureRequest().setNoAttributes()
+        request.setDestinationCrs(overlay_layer.crs(), context.transformContext())
+        hits = set()
+        for input_feat in input_layer.getFeatures(request):
+            if feedback.isCanceled():
+                return None
+            if input_feat.hasGeometry():
+                hits.update(overlay_index.intersects(input_feat.geometry().boundingBox()))
+
+        pruned = overlay_layer.featureCount() - len(hits)
+        feedback.pushInfo(
+            f"Overlay prefilter kept {len(hits)} feature(s) and pruned {pruned} feature(s) that do not reach the Input Layer\n"
+        )
+        if pruned <= 0:
+            return None
+
+        subset = overlay_layer.materialize(QgsFeatureRequest().setFilterFids(hits))
+        context.temporaryLayerStore().addMapLayer(subset)
+        return subset.id()
+
+    def processFastEngine(self, parameters, context, feedback, profiler):
+        """
+        Single pass alternative to the processing.run chain. Every input feature is clipped against
+        spatially indexed overlay candidates and the Result and Report sinks are written directly,
+        without creating intermediate layers.
+        """
+        results = {}
+        profile_file = self.parameterAsFileOutput(parameters, "profile", context)
+        count_vertices = profiler.count_vertices
+
+        input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
+        overlay_layer = self.parameterAsVectorLayer(parameters, "overlaylayer", context)
+        fields_to_average = self.parameterAsFields(parameters, "fieldtoaverage", context)
+        additional_fields = self.parameterAsFields(parameters, "additionalfields", context)
+        ident_name = parameters["identifierfieldforreport"]
+        weighted_fields = ["weighted_" + field for field in fields_to_average]
+
+        # overlay fields in overlay layer order, as the intersection would emit them
+        key_names = fields_to_average + [field for field in additional_fields if field not in fields_to_average]
+        overlay_fields = [field for field in overlay_layer.fields() if field.name() in key_names]
+        overlay_names = [field.name() for field in overlay_fields]
+        value_positions = [overlay_names.index(field) for field in fields_to_average]
+
+        area_mode = self.parameterAsEnum(parameters, "areamode", context)
+        measure_area = areaMeasure(area_mode, input_layer, context)
+        if area_mode == AREA_MODE_EQUAL_AREA:
+            feedback.pushInfo(f"Measuring areas in {measure_area.transform.destinationCrs().toProj()}\n")
+        elif area_mode == AREA_MODE_ELLIPSOIDAL:
+            feedback.pushInfo(f"Measuring areas on the ellipsoid {measure_area.ellipsoid}, in square meters\n")
+
+        # pieces of a previous run of the same input/overlay pair and area measure can be reused
+        cache = None
+        cache_hit = False
+        cache_folder = self.parameterAsString(parameters, "fragmentcache", context)
+        if cache_folder:
+            cache = FragmentCache(cache_folder, self.parameterAsInt(parameters, "cachesize", context))
+            with profiler.stage("Layers fingerprint"):
+                fingerprint = layersFingerprint(input_layer, overlay_layer, measure_area.key, feedback)
+            if fingerprint is None:
+                return {}
+            cache_hit = cache.contains(fingerprint)
+            if cache_hit:
+                feedback.pushInfo("Intersection fragments found in the cache, skipping the overlay ...")
+
+        # streaming mode: the overlay is loaded chunk by chunk of input features instead of all at once
+        chunk_size = self.parameterAsInt(parameters, "chunksize", context)
+
+        # vectorized backend: the whole overlay is held as a Shapely array, the input is read in blocks
+        vectorized = self.parameterAsEnum(parameters, "geometrybackend", context) == BACKEND_VECTORIZED
+        vectorized = vectorized and not cache_hit
+        if vectorized:
             try:
-                try:
-                    import pandas as pd
-                except ImportError:
-                    feedback.pushInfo("Python library pandas was not found. Installing pandas to QGIS python ...")
-                    import pathlib as pl
-                    import subprocess
+                importShapely()
+            except ImportError as e:
+                raise QgsProcessingException(f"The vectorized geometry backend needs Shapely 2: {e}")
+        streaming = chunk_size > 0 and not cache_hit and not vectorized
+
+        # sliver fragments are removed from the clipped pieces, the cache keeps every piece
+        sliver_area = self.parameterAsDouble(parameters, "sliverarea", context)
+        sliver_percent = self.parameterAsDouble(parameters, "sliverpercent", context)
+        sliver_threshold = sliver_area > 0 or sliver_percent > 0
+        sliver_fold = self.parameterAsEnum(parameters, "sliverhandling", context) == SLIVER_FOLD
+
+        # overlay keys are dictionary encoded: overlay_keys maps fid to a code, keys maps code to values
+        overlay_index = QgsSpatialIndex(QgsSpatialIndex.FlagStoreFeatureGeometries)
+        overlay_keys = {}
+        key_codes = {}
+        keys = []
+
+        def encodeKey(overlay_feat):
+            key = tuple(pyValue(overlay_feat[name]) for name in overlay_names)
+            code = key_codes.get(key)
+            if code is None:
+                code = key_codes[key] = len(keys)
+                keys.append(key)
+            return code
+
+        # index the overlay once, in the input layer CRS, keeping geometries in the index
+        overlay_request = QgsFeatureRequest()
+        overlay_request.setSubsetOfAttributes(overlay_names, overlay_layer.fields())
+        overlay_request.setDestinationCrs(input_layer.crs(), context.transformContext())
+        if not streaming:
+            request = QgsFeatureRequest(overlay_request)
+            if cache_hit:
+                request.setFlags(QgsFeatureRequest.NoGeometry)
+            else:
+                feedback.pushInfo("Building spatial index of the overlay layer ...")
+            with profiler.stage("Overlay index") as stage:
+                overlay_count = 0
+                overlay_vertices = 0 if count_vertices and not cache_hit else None
+                overlay_wkbs = []
+                for overlay_feat in overlay_layer.getFeatures(request):
+                    if feedback.isCanceled():
+                        return {}
+                    overlay_count += 1
+                    if not cache_hit:
+                        if not overlay_feat.hasGeometry():
+                            continue
+                        if vectorized:
+                            overlay_wkbs.append(bytes(overlay_feat.geometry().asWkb()))
+                        else:
+                            overlay_index.addFeature(overlay_feat)
+                        if overlay_vertices is not None:
+                            overlay_vertices += overlay_feat.geometry().constGet().nCoordinates()
+                    overlay_keys[overlay_feat.id()] = encodeKey(overlay_feat)
+                if vectorized:
+                    vector_overlay = VectorOverlay(list(overlay_keys), overlay_wkbs)
+                    del overlay_wkbs
+                stage.setCounts(overlay_count, len(overlay_keys), overlay_vertices, overlay_vertices)
+
+        # Result: input fields plus one weighted field per field to average
+        # additional overlays only add their weighted field to the Result
+        if self.parameterAsLayerList(parameters, "additionaloverlays", context):
+            if vectorized:
+                raise QgsProcessingException("Additional overlay layers are not available with the vectorized backend")
+            if streaming:
+                raise QgsProcessingException("Additional overlay layers are not available in streaming mode")
+            if self.parameterAsInt(parameters, "workers", context) > 1 and not cache_hit:
+                raise QgsProcessingException("Additional overlay layers are not available with worker processes")
+        extra_overlays = self.loadAdditionalOverlays(
+            parameters, input_layer, input_layer.fields().names() + weighted_fields, context, feedback, profiler
+        )
+        if extra_overlays is None:
+            return {}
 
-                    qgis_Path = pl.Path(sys.executable)
-                    qgis_python_path = (qgis_Path.parent / "python3.exe").as_posix()
+        result_fields = QgsFields(input_layer.fields())
+        for weighted_field in weighted_fields:
+            result_fields.append(QgsField(weighted_field, QVariant.Double))
+        for weighted_field, extra_index, extra_values in extra_overlays:
+            result_fields.append(QgsField(weighted_field, QVariant.Double))
+        result_name = input_layer.name() + "_" + "_".join(fields_to_average)
+        setDestinationName(parameters, "result", result_name)
+        batch_size = self.parameterAsInt(parameters, "writebatchsize", context)
+        (result_sink, result_id) = self.bulkSink(
+            parameters,
+            "result",
+            result_name,
+            context,
+            result_fields,
+            input_layer.wkbType(),
+            input_layer.crs(),
+            batch_size,
+        )
 
-                    subprocess.check_call([qgis_python_path, "-m", "pip", "install", "--user", "pandas"])
-                    import pandas as pd
+        # Report: identifier, id, overlay fields, weighted values, fragment area and percentage
+        compact_report = self.parameterAsBool(parameters, "compactreport", context)
+        report_fields = self.reportFields(input_layer, ident_name, overlay_fields, weighted_fields, compact_report)
+        setDestinationName(parameters, "reportaslayer", "Report as Layer")
+        (report_sink, report_id) = self.bulkSink(
+            parameters,
+            "reportaslayer",
+            "Report as Layer",
+            context,
+            report_fields,
+            QgsWkbTypes.NoGeometry if compact_report else QgsWkbTypes.MultiPolygon,
+            input_layer.crs(),
+            batch_size,
+            dictionary_fields=[field for field in additional_fields if field not in fields_to_average],
+        )
 
-                    feedback.pushInfo("Python library pandas was successfully installed for QGIS python")
-            except:
-                feedback.reportError(
-                    "Failed to import pandas. Tried installing pandas but failed.\nPlease manually install pandas for the python that comes with your QGIS.",
-                    True,
+        # the HTML report is streamed: buffered rows are appended to the file every HTML_FLUSH_ROWS rows
+        output_file = self.parameterAsFileOutput(parameters, "reportasHTML", context)
+        report_rows = None
+        if output_file:
+            pd = self.importPandas(feedback)
+            if pd is not None:
+                report_rows = []
+                html_report = htmlReport(
+                    output_file, self.parameterAsInt(parameters, "htmlpagesize", context), weighted_fields
                 )
-                return results
 
-            # Drop geometries
+        def flushReportRows():
+            if report_rows:
+                df = pd.DataFrame(report_rows, columns=report_fields.names())
+                df = df.astype({field.name(): dataFrameType(field) for field in report_fields})
+                self.writeHtmlSections(pd, html_report, df, ident_name, weighted_fields)
+                report_rows.clear()
+
+        # areal weight matrix export
+        matrix_file = self.parameterAsFileOutput(parameters, "weightmatrix", context)
+        matrix_builder = None
+        if matrix_file:
+            if streaming:
+                request = QgsFeatureRequest().setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+                matrix_builder = WeightMatrixBuilder([feat.id() for feat in overlay_layer.getFeatures(request)])
+            else:
+                matrix_builder = WeightMatrixBuilder(overlay_keys)
+
+        # incremental mode: input features whose geometry did not change since the previous Result
+        unchanged = {}
+        previous_result = self.parameterAsVectorLayer(parameters, "previousresult", context)
+        previous_report = self.parameterAsVectorLayer(parameters, "previousreport", context)
+        if previous_result is not None and matrix_builder is not None:
+            feedback.reportError("The weight matrix needs every feature to be clipped, incremental mode is ignored\n")
+        elif previous_result is not None and extra_overlays:
+            feedback.reportError(
+                "Additional overlay layers need every feature to be clipped, incremental mode is ignored\n"
+            )
+        elif previous_result is not None:
+            with profiler.stage("Incremental comparison") as stage:
+                unchanged = self.findUnchangedFeatures(
+                    input_layer,
+                    previous_result,
+                    previous_report,
+                    ident_name,
+                    weighted_fields,
+                    report_fields.names(),
+                    feedback,
+                )
+                stage.setCounts(input_layer.featureCount(), len(unchanged))
+            if feedback.isCanceled():
+                return {}
+
+        # counters of the clip and write stage
+        written = collections.Counter()
+
+        def carryFeature(input_feat_id, input_feat, result_fid, report_fids):
+            previous_feat = previous_result.getFeature(result_fid)
+            result_feat = QgsFeature(result_fields)
+            result_feat.setGeometry(previous_feat.geometry())
+            result_feat.setAttributes(
+                input_feat.attributes() + [previous_feat[weighted_field] for weighted_field in weighted_fields]
+            )
+            result_sink.addFeature(result_feat, QgsFeatureSink.FastInsert)
+
+            for report_feat in previous_report.getFeatures(QgsFeatureRequest().setFilterFids(report_fids)):
+                attributes = [
+                    input_feat_id if name == "input_feat_id" else report_feat[name] for name in report_fields.names()
+                ]
+                carried_feat = QgsFeature(report_fields)
+                if not compact_report:
+                    carried_feat.setGeometry(report_feat.geometry())
+                carried_feat.setAttributes(attributes)
+                report_sink.addFeature(carried_feat, QgsFeatureSink.FastInsert)
+                written["report"] += 1
+                if report_rows is not None:
+                    report_rows.append([pyValue(value) for value in attributes])
+
+        total = 100.0 / input_layer.featureCount() if input_layer.featureCount() else 0
+
+        # a compact report only needs the summed areas, pieces are not collected into fragments
+        group = groupAreas if compact_report else groupPieces
+
+        def writeFeature(input_feat_id, input_feat, measured, weighted_sums=None):
+            fragments = [(keys[code], fragment, area) for code, fragment, area in group(measured, overlay_keys)]
+
+            input_area = measure_area(input_feat.geometry())
+            if weighted_sums is None:
+                weighted_sums = []
+                for value_position in value_positions:
+                    weighted_sum = None
+                    for key, fragment, area in fragments:
+                        if key[value_position] is not None:
+                            weighted_sum = (weighted_sum or 0) + key[value_position] * area
+                    weighted_sums.append(weighted_sum)
+            weighted_values = [
+                weighted_sum / input_area if weighted_sum is not None and input_area else None
+                for weighted_sum in weighted_sums
+            ]
+
+            # the input geometry and its area are shared by the additional overlays, their pieces are
+            # measured and rid of slivers like those of the Overlay Layer
+            extra_weighted_values = []
+            for weighted_field, extra_index, extra_values in extra_overlays:
+                weighted_sum = None
+                if input_feat.hasGeometry():
+                    pieces = clipPieces(input_feat.geometry(), extra_index)
+                    piece_areas = measure_area.areas([piece for overlay_fid, piece in pieces]).tolist()
+                    extra_measured = [
+                        (overlay_fid, piece, area) for (overlay_fid, piece), area in zip(pieces, piece_areas)
+                    ]
+                    if sliver_threshold:
+                        extra_measured = removeSlivers(
+                            extra_measured, input_area, sliver_area, sliver_percent, sliver_fold
+                        )[0]
+                    for overlay_fid, piece, area in extra_measured:
+                        if extra_values[overlay_fid] is not None:
+                            weighted_sum = (weighted_sum or 0) + extra_values[overlay_fid] * area
+                extra_weighted_values.append(
+                    weighted_sum / input_area if weighted_sum is not None and input_area else None
+                )
+
+            # the input feature is written as it is, no union of its fragments
+            result_feat = QgsFeature(result_fields)
+            result_feat.setGeometry(input_feat.geometry())
+            result_feat.setAttributes(input_feat.attributes() + weighted_values + extra_weighted_values)
+            result_sink.addFeature(result_feat, QgsFeatureSink.FastInsert)
+
+            rounded_areas = [round(area, 5) for key, fragment, area in fragments]
+            covered_area = sum(rounded_areas)
+            report = []
+            for (key, fragment, area), area_crs_units in zip(fragments, rounded_areas):
+                area_prcnt = round(area_crs_units * 100 / covered_area, 5) if covered_area else None
+                attributes = [input_feat[ident_name]] if ident_name else []
+                attributes += [input_feat_id] + list(key) + weighted_values + [area_crs_units, area_prcnt]
+                report.append((area_prcnt if area_prcnt is not None else 0, fragment, attributes))
+            report.sort(key=lambda row: row[0])
+
+            for area_prcnt, fragment, attributes in report:
+                report_feat = QgsFeature(report_fields)
+                if fragment is not None:
+                    report_feat.setGeometry(fragment)
+                report_feat.setAttributes(attributes)
+                report_sink.addFeature(report_feat, QgsFeatureSink.FastInsert)
+                written["report"] += 1
+                if count_vertices and fragment is not None:
+                    written["vertices_out"] += fragment.constGet().nCoordinates()
+                if report_rows is not None:
+                    report_rows.append([pyValue(value) for value in attributes])
+
+        # input features lying within the overlay features they intersect are not clipped
+        clip_stats = collections.Counter()
+
+        def clipSerial():
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                if current + 1 in unchanged:
+                    yield current + 1, input_feat, None
+                elif input_feat.hasGeometry():
+                    yield current + 1, input_feat, clipPieces(input_feat.geometry(), overlay_index, clip_stats)
+                else:
+                    yield current + 1, input_feat, []
+
+        def readCache():
+            cached = cache.read(fingerprint)
+            entry = next(cached, None)
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                pieces = []
+                if entry is not None and entry[0] == current + 1:
+                    pieces = [(overlay_fid, geometryFromWkb(wkb), area) for overlay_fid, area, wkb in entry[1]]
+                    entry = next(cached, None)
+                if current + 1 in unchanged:
+                    yield current + 1, input_feat, None
+                else:
+                    yield current + 1, input_feat, pieces
+
+        def clipChunk(chunk):
+            # only the overlay features under the input features of the chunk are held, each feature
+            # rectangle is queried on its own so a chunk spread over the layer does not load the
+            # overlay between its features; overlay_keys is refilled per chunk
+            chunk_index = QgsSpatialIndex(QgsSpatialIndex.FlagStoreFeatureGeometries)
+            overlay_keys.clear()
+            for input_feat_id, input_feat in chunk:
+                if input_feat_id in unchanged or not input_feat.hasGeometry():
+                    continue
+                request = QgsFeatureRequest(overlay_request).setFilterRect(input_feat.geometry().boundingBox())
+                for overlay_feat in overlay_layer.getFeatures(request):
+                    if overlay_feat.hasGeometry() and overlay_feat.id() not in overlay_keys:
+                        chunk_index.addFeature(overlay_feat)
+                        overlay_keys[overlay_feat.id()] = encodeKey(overlay_feat)
+
+            for input_feat_id, input_feat in chunk:
+                if input_feat_id in unchanged:
+                    yield input_feat_id, input_feat, None
+                elif input_feat.hasGeometry():
+                    yield input_feat_id, input_feat, clipPieces(input_feat.geometry(), chunk_index, clip_stats)
+                else:
+                    yield input_feat_id, input_feat, []
+
+        def clipStreaming():
+            chunk = []
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                chunk.append((current + 1, input_feat))
+                if len(chunk) >= chunk_size:
+                    yield from clipChunk(chunk)
+                    chunk = []
+            if chunk:
+                yield from clipChunk(chunk)
+
+        # weighted sums of the vectorized backend, per input feature of the current block
+        vector_sums = {}
+        if vectorized:
+            vector_planar = area_mode == AREA_MODE_LAYER_CRS and planarAreas(input_layer.crs(), context)
+            vector_values = [
+                vector_overlay.overlayValues(lambda fid, position=position: keys[overlay_keys[fid]][position])
+                for position in value_positions
+            ]
+
+        def clipBlock(block):
+            input_wkbs = [
+                bytes(input_feat.geometry().asWkb())
+                if input_feat_id not in unchanged and input_feat.hasGeometry()
+                else None
+                for input_feat_id, input_feat in block
+            ]
+            input_positions, overlay_positions, piece_wkbs, areas, contained = vector_overlay.intersect(input_wkbs)
+            clip_stats["contained"] += contained
+            bounds = np.searchsorted(input_positions, np.arange(len(block) + 1)).tolist()
+            overlay_fids = vector_overlay.overlay_fids[overlay_positions].tolist()
+            # planar sums are only valid while every piece keeps its area
+            vector_sums.clear()
+            if vector_planar and not sliver_threshold:
+                sums = [
+                    weightedSums(input_positions, values[overlay_positions], areas, len(block))
+                    for values in vector_values
+                ]
+                for position, (input_feat_id, input_feat) in enumerate(block):
+                    vector_sums[input_feat_id] = [None if np.isnan(s[position]) else float(s[position]) for s in sums]
+            # a compact report without cache does not need the geometry of the pieces
+            need_geometries = not compact_report or cache_writer is not None or not vector_planar
+            if need_geometries:
+                geometries = [polygonalPart(geometryFromWkb(wkb)) for wkb in piece_wkbs]
+            else:
+                geometries = [None] * len(piece_wkbs)
+            # other measures than planar areas take all pieces of the block in one call
+            areas = areas.tolist() if vector_planar else measure_area.areas(geometries).tolist()
+
+            for position, (input_feat_id, input_feat) in enumerate(block):
+                if input_feat_id in unchanged:
+                    yield input_feat_id, input_feat, None
+                    continue
+                yield input_feat_id, input_feat, [
+                    (overlay_fids[i], geometries[i], areas[i]) for i in range(bounds[position], bounds[position + 1])
+                ]
+
+        def clipVectorized():
+            block = []
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                block.append((current + 1, input_feat))
+                if len(block) >= block_size:
+                    yield from clipBlock(block)
+                    block = []
+            if block:
+                yield from clipBlock(block)
+
+        workers = self.parameterAsInt(parameters, "workers", context)
+        cache_writer = None
+        if cache_hit:
+            clipped_features = readCache()
+        elif vectorized:
+            if workers > 1:
+                feedback.reportError("The vectorized backend runs in a single process, Worker Processes is ignored\n")
+            block_size = chunk_size or VECTOR_BLOCK_SIZE
+            feedback.pushInfo(f"Intersecting input features with Shapely in blocks of {block_size} features ...")
+            clipped_features = clipVectorized()
+        elif streaming:
+            if workers > 1:
+                feedback.reportError("Streaming mode clips in a single process, Worker Processes is ignored\n")
+            feedback.pushInfo(f"Streaming the input layer in chunks of {chunk_size} features ...")
+            clipped_features = clipStreaming()
+        elif workers > 1:
+            feedback.pushInfo(f"Clipping input features with {workers} worker processes ...")
+            clipped_features = self.clipInParallel(input_layer, overlay_index, workers, unchanged, clip_stats)
+        else:
+            clipped_features = clipSerial()
+        if cache is not None and not cache_hit and not unchanged:
+            cache_writer = cache.writer(fingerprint)
+
+        with profiler.stage("Clip and write") as stage:
+            for input_feat_id, input_feat, pieces in clipped_features:
+                if feedback.isCanceled():
+                    clipped_features.close()
+                    if cache_writer is not None:
+                        cache_writer.discard()
+                    if report_rows is not None:
+                        html_report.close()
+                    return {}
+                feedback.setProgress(int(input_feat_id * total))
+                written["input"] += 1
+                if count_vertices and input_feat.hasGeometry():
+                    written["vertices_in"] += input_feat.geometry().constGet().nCoordinates()
+                if pieces is None:
+                    carryFeature(input_feat_id, input_feat, *unchanged[input_feat_id])
+                    continue
+                if vectorized or cache_hit:
+                    # the vectorized backend and the cache give pieces with their areas
+                    measured = pieces
+                else:
+                    # all pieces of the feature are measured in one call, vectorized by the ring measures
+                    piece_areas = measure_area.areas([piece for overlay_fid, piece in pieces]).tolist()
+                    measured = [(overlay_fid, piece, area) for (overlay_fid, piece), area in zip(pieces, piece_areas)]
+                if cache_writer is not None and measured:
+                    cache_writer.add(
+                        input_feat_id,
+                        [(overlay_fid, area, bytes(piece.asWkb())) for overlay_fid, piece, area in measured],
+                    )
+                if sliver_threshold:
+                    input_area = measure_area(input_feat.geometry())
+                    measured, removed, removed_area = removeSlivers(
+                        measured, input_area, sliver_area, sliver_percent, sliver_fold
+                    )
+                    written["slivers"] += removed
+                    written["sliver_area"] += removed_area
+                    written["input_area"] += input_area
+                if matrix_builder is not None:
+                    matrix_builder.addRow(
+                        input_feat_id,
+                        measure_area(input_feat.geometry()),
+                        [(overlay_fid, area) for overlay_fid, piece, area in measured],
+                    )
+                writeFeature(input_feat_id, input_feat, measured, vector_sums.pop(input_feat_id, None))
+                if report_rows is not None and len(report_rows) >= HTML_FLUSH_ROWS:
+                    flushReportRows()
+            stage.setCounts(
+                written["input"],
+                written["report"],
+                written["vertices_in"] if count_vertices else None,
+                written["vertices_out"] if count_vertices else None,
+            )
+
+        if not cache_hit:
+            feedback.pushInfo(
+                f"{clip_stats['contained']} input feature(s) within the overlay features they intersect took "
+                "the containment fast path, without clipping\n"
+            )
+        if sliver_threshold:
+            self.reportSlivers(
+                feedback, written["slivers"], written["sliver_area"], written["input_area"], sliver_fold
+            )
+
+        if cache_writer is not None:
+            with profiler.stage("Cache commit"):
+                cache_writer.commit()
+
+        # bulk writers hold the last batch until they are closed
+        if batch_size > 0:
+            with profiler.stage("Bulk output"):
+                for sink, label in ((result_sink, "Result"), (report_sink, "Report as Layer")):
+                    sink.close()
+                    feedback.pushInfo(sink.throughput(label))
+
+        results["result"] = result_id
+        results["reportaslayer"] = report_id
+
+        if matrix_builder is not None:
+            request = QgsFeatureRequest().setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+            input_fids = [input_feat.id() for input_feat in input_layer.getFeatures(request)]
+            with profiler.stage("Weight matrix"):
+                matrix_builder.save(matrix_file, input_fids, input_layer.crs().toWkt())
+            results["weightmatrix"] = matrix_file
+
+        # finish HTML report
+        if report_rows is not None:
+            with profiler.stage("HTML report"):
+                flushReportRows()
+                html_report.close()
+            results["reportasHTML"] = output_file
+
+        return self.finishProfile(profiler, profile_file, results, feedback)
+
+    def processApproximate(self, parameters, context, feedback, profiler):
+        """
+        Approximate mode. The overlay is a raster, either given directly or rasterized from the fields
+        to average at the chosen cell size, and each input feature is weighted by the exact fractions of
+        the cells it covers. For a rasterized overlay, only cells crossed by an overlay boundary can hold
+        a wrong value, which gives an error bound for each input feature.
+        """
+        results = {}
+        profile_file = self.parameterAsFileOutput(parameters, "profile", context)
+        input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
+        overlay_raster = self.parameterAsRasterLayer(parameters, "overlayraster", context)
+
+        # sources: weighted field name, raster layer, band and value range of the field, None for a raster overlay
+        sources = []
+        boundary_raster = None
+        if overlay_raster is not None:
+            bands = self.parameterAsInts(parameters, "rasterbands", context)
+            for band in bands or range(1, overlay_raster.bandCount() + 1):
+                sources.append((f"weighted_band{band}", overlay_raster, band, None))
+        else:
+            overlay_layer = self.parameterAsVectorLayer(parameters, "overlaylayer", context)
+            fields_to_average = self.parameterAsFields(parameters, "fieldtoaverage", context)
+            if overlay_layer is None or not fields_to_average:
+                raise QgsProcessingException("Approximate mode needs an Overlay Layer and a Field to Average.")
+            cell_size = self.parameterAsDouble(parameters, "approxcellsize", context)
+
+            # input extent in the overlay CRS, grown to whole cells
+            transform = QgsCoordinateTransform(input_layer.crs(), overlay_layer.crs(), context.transformContext())
+            extent = transform.transformBoundingBox(input_layer.extent())
+            extent = QgsRectangle(
+                math.floor(extent.xMinimum() / cell_size) * cell_size,
+                math.floor(extent.yMinimum() / cell_size) * cell_size,
+                (math.floor(extent.xMaximum() / cell_size) + 1) * cell_size,
+                (math.floor(extent.yMaximum() / cell_size) + 1) * cell_size,
+            )
+            grid_params = {"UNITS": 1, "WIDTH": cell_size, "HEIGHT": cell_size, "EXTENT": extent}
+
+            for field in fields_to_average:
+                alg_params = {
+                    "INPUT": overlay_layer,
+                    "FIELD": field,
+                    "NODATA": RASTER_NODATA,
+                    "DATA_TYPE": 6,
+                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                    **grid_params,
+                }
+                outputs = profiler.run(f"Rasterize {field}", "gdal:rasterize", alg_params, context, feedback)
+                field_index = overlay_layer.fields().lookupField(field)
+                # a cell on the outer boundary of the overlay can be wrong by its whole value, not only by
+                # the spread of the values, so the range always includes 0
+                maximum = overlay_layer.maximumValue(field_index)
+                minimum = overlay_layer.minimumValue(field_index)
+                value_range = max(maximum, 0) - min(minimum, 0)
+                sources.append(("weighted_" + field, QgsRasterLayer(outputs["OUTPUT"], field), 1, value_range))
+                if feedback.isCanceled():
+                    return {}
+
+            # cells touched by an overlay boundary, the only ones where the burnt value can be wrong
+            alg_params = {"INPUT": overlay_layer, "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT}
+            boundaries = profiler.run("Overlay boundaries", "native:boundary", alg_params, context, feedback)
             alg_params = {
-                "INPUT": outputs["area_prcnt"]["OUTPUT"],
+                "INPUT": boundaries["OUTPUT"],
+                "BURN": 1,
+                "NODATA": 0,
+                "DATA_TYPE": 0,
+                "EXTRA": "-at",
                 "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                **grid_params,
             }
-            outputs["DropGeometries"] = processing.run(
-                "native:dropgeometries",
-                alg_params,
-                context=context,
-                feedback=feedback,
-                is_child_algorithm=True,
+            outputs = profiler.run("Rasterize boundaries", "gdal:rasterize", alg_params, context, feedback)
+            boundary_raster = QgsRasterLayer(outputs["OUTPUT"], "boundaries")
+            if feedback.isCanceled():
+                return {}
+
+        # all sources share the grid of the first one
+        grid = sources[0][1]
+        x_res = grid.rasterUnitsPerPixelX()
+        y_res = grid.rasterUnitsPerPixelY()
+        cell_area = x_res * y_res
+        to_grid = None
+        if grid.crs() != input_layer.crs():
+            to_grid = QgsCoordinateTransform(input_layer.crs(), grid.crs(), context.transformContext())
+
+        result_fields = QgsFields(input_layer.fields())
+        for name, raster, band, value_range in sources:
+            result_fields.append(QgsField(name, QVariant.Double))
+        for name, raster, band, value_range in sources:
+            if value_range is not None:
+                result_fields.append(QgsField("approx_error_" + name[len("weighted_") :], QVariant.Double))
+        setDestinationName(parameters, "result", input_layer.name() + "_approximate")
+        (result_sink, result_id) = self.parameterAsSink(
+            parameters, "result", context, result_fields, input_layer.wkbType(), input_layer.crs()
+        )
+
+        total = 100.0 / input_layer.featureCount() if input_layer.featureCount() else 0
+        largest_errors = [0.0] * len(sources)
+        with profiler.stage("Coverage fractions", input_layer) as stage:
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                if feedback.isCanceled():
+                    return {}
+                feedback.setProgress(int(current * total))
+
+                weighted_values = [None] * len(sources)
+                error_bounds = [None if value_range is None else 0.0 for name, raster, band, value_range in sources]
+                geom = QgsGeometry(input_feat.geometry()) if input_feat.hasGeometry() else None
+                if geom is not None and to_grid is not None:
+                    geom.transform(to_grid)
+                window = alignedWindow(geom.boundingBox(), grid.extent(), x_res, y_res) if geom is not None else None
+                input_area = geom.area() if geom is not None else 0
+
+                if window is not None and input_area:
+                    weights = coverageFractions(geom, window, x_res, y_res) * cell_area
+                    mixed = None
+                    if boundary_raster is not None:
+                        mixed = readWindow(boundary_raster.dataProvider(), 1, window, x_res, y_res) == 1
+                    for i, (name, raster, band, value_range) in enumerate(sources):
+                        values = readWindow(raster.dataProvider(), band, window, x_res, y_res)
+                        valid = ~np.isnan(values) & (weights > 0)
+                        if valid.any():
+                            weighted_values[i] = float((values[valid] * weights[valid]).sum() / input_area)
+                        if value_range is not None and mixed is not None:
+                            error_bounds[i] = float(weights[mixed].sum() * value_range / input_area)
+                            largest_errors[i] = max(largest_errors[i], error_bounds[i])
+
+                result_feat = QgsFeature(result_fields)
+                result_feat.setGeometry(input_feat.geometry())
+                result_feat.setAttributes(
+                    input_feat.attributes() + weighted_values + [bound for bound in error_bounds if bound is not None]
+                )
+                result_sink.addFeature(result_feat, QgsFeatureSink.FastInsert)
+            stage.setOutput(result_id)
+
+        for (name, raster, band, value_range), largest_error in zip(sources, largest_errors):
+            if value_range is not None:
+                feedback.pushInfo(f"Approximate mode: largest error bound of {name} is {largest_error:.5f}")
+        feedback.pushInfo("Report as Layer and Report as HTML are not produced in approximate mode\n")
+
+        results["result"] = result_id
+        return self.finishProfile(profiler, profile_file, results, feedback)
+
+    def loadAdditionalOverlays(self, parameters, input_layer, taken_names, context, feedback, profiler):
+        """
+        Index the additional overlay layers in the input layer CRS. Returns a (weighted field, index,
+        values by fid) triple per layer, or None if canceled.
+        """
+        layers = self.parameterAsLayerList(parameters, "additionaloverlays", context)
+        fields = self.parameterAsString(parameters, "additionaloverlayfields", context)
+        fields = [field.strip() for field in (fields or "").split(";") if field.strip()]
+        if len(fields) != len(layers):
+            raise QgsProcessingException(
+                f"{len(layers)} additional overlay layer(s) but {len(fields)} field(s) to average were given"
             )
 
-            feedback.setCurrentStep(13)
+        overlays = []
+        taken_names = set(taken_names)
+        for layer, field in zip(layers, fields):
+            field_index = layer.fields().lookupField(field)
+            if field_index < 0 or not layer.fields().field(field_index).isNumeric():
+                raise QgsProcessingException(f"{field} is not a numeric field of {layer.name()}")
+            weighted_field = "weighted_" + field
+            if weighted_field in taken_names:
+                weighted_field = f"weighted_{layer.name()}_{field}"
+            taken_names.add(weighted_field)
+
+            request = QgsFeatureRequest()
+            request.setSubsetOfAttributes([field_index])
+            request.setDestinationCrs(input_layer.crs(), context.transformContext())
+            index = QgsSpatialIndex(QgsSpatialIndex.FlagStoreFeatureGeometries)
+            values = {}
+            with profiler.stage(f"Overlay index {layer.name()}") as stage:
+                for overlay_feat in layer.getFeatures(request):
+                    if feedback.isCanceled():
+                        return None
+                    if overlay_feat.hasGeometry():
+                        index.addFeature(overlay_feat)
+                        values[overlay_feat.id()] = pyValue(overlay_feat[field_index])
+                stage.setCounts(layer.featureCount(), len(values))
+            overlays.append((weighted_field, index, values))
+        return overlays
+
+    def reportFields(self, input_layer, ident_name, overlay_fields, weighted_fields, compact):
+        """
+        Fields of the Report: identifier, id, overlay fields, weighted values, area and percentage. A
+        compact report uses a 32 bit id and plain doubles without display length.
+        """
+        report_fields = QgsFields()
+        if ident_name:
+            report_fields.append(input_layer.fields().field(ident_name))
+        report_fields.append(QgsField("input_feat_id", QVariant.Int if compact else QVariant.LongLong))
+        for field in overlay_fields:
+            report_fields.append(field)
+        for weighted_field in weighted_fields:
+            report_fields.append(QgsField(weighted_field, QVariant.Double))
+        if compact:
+            report_fields.append(QgsField("area_crs_units", QVariant.Double))
+            report_fields.append(QgsField("area_prcnt", QVariant.Double))
+        else:
+            report_fields.append(QgsField("area_crs_units", QVariant.Double, len=20, prec=5))
+            report_fields.append(QgsField("area_prcnt", QVariant.Double, len=9, prec=5))
+        return report_fields
+
+    def writeCompactReport(self, parameters, fragments_id, ident_name, key_names, weighted_fields, context):
+        """
+        Write Report as Layer as an attribute table from the fragments of the processing chain.
+        Fragment areas are summed per input feature and overlay fields in a single pass, so no
+        geometry is collected and no field is calculated over geometries. Returns the report id.
+        """
+        fragments_layer = QgsProcessingUtils.mapLayerFromString(fragments_id, context)
+        input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
+        field_names = fragments_layer.fields().names()
+        key_positions = [field_names.index(name) for name in key_names]
+        weighted_positions = [field_names.index(name) for name in weighted_fields]
+        id_position = field_names.index("input_feat_id")
+        ident_position = field_names.index(ident_name) if ident_name else None
+        measure_area = areaCalculator(fragments_layer.crs(), context)
+
+        # (input_feat_id, overlay values) -> [attributes, summed area]
+        groups = {}
+        for feat in fragments_layer.getFeatures():
+            attributes = feat.attributes()
+            input_feat_id = pyValue(attributes[id_position])
+            group_key = (input_feat_id,) + tuple(pyValue(attributes[i]) for i in key_positions)
+            group = groups.get(group_key)
+            if group is None:
+                values = [pyValue(attributes[ident_position])] if ident_name else []
+                values += list(group_key) + [pyValue(attributes[i]) for i in weighted_positions]
+                group = groups[group_key] = [values, 0.0]
+            group[1] += measure_area(feat.geometry())
+
+        covered_areas = collections.Counter()
+        for group in groups.values():
+            group[1] = round(group[1], 5)
+        for (input_feat_id, *_), (values, area) in groups.items():
+            covered_areas[input_feat_id] += area
+
+        rows = []
+        for (input_feat_id, *_), (values, area) in groups.items():
+            covered_area = covered_areas[input_feat_id]
+            area_prcnt = round(area * 100 / covered_area, 5) if covered_area else None
+            rows.append((input_feat_id, area_prcnt if area_prcnt is not None else 0, values + [area, area_prcnt]))
+        rows.sort(key=lambda row: row[:2])
+
+        overlay_fields = [fragments_layer.fields().field(name) for name in key_names]
+        report_fields = self.reportFields(input_layer, ident_name, overlay_fields, weighted_fields, True)
+        (report_sink, report_id) = self.parameterAsSink(
+            parameters, "reportaslayer", context, report_fields, QgsWkbTypes.NoGeometry, fragments_layer.crs()
+        )
+        for input_feat_id, area_prcnt, attributes in rows:
+            report_feat = QgsFeature(report_fields)
+            report_feat.setAttributes(attributes)
+            report_sink.addFeature(report_feat, QgsFeatureSink.FastInsert)
+        return report_id
+
+    def bulkSink(
+        self, parameters, name, layer_name, context, fields, wkb_type, crs, batch_size, dictionary_fields=()
+    ):
+        """
+        Sink of a Fast Engine output. With a batch size above 0, GeoPackage and GeoParquet files are
+        written by the bulk writers and any other destination receives its features in batches.
+        """
+        if batch_size <= 0:
+            return self.parameterAsSink(parameters, name, context, fields, wkb_type, crs)
+
+        path = self.parameterAsOutputLayer(parameters, name, context)
+        try:
+            writer = bulkWriter(path, layer_name, fields, wkb_type, crs, batch_size, dictionary_fields)
+        except ImportError as e:
+            raise QgsProcessingException(f"Bulk output to {path} needs a missing module: {e}")
+        if writer is None:
+            (sink, dest_id) = self.parameterAsSink(parameters, name, context, fields, wkb_type, crs)
+            return BatchedSink(sink, batch_size), dest_id
+
+        # the file is not created through a processing sink, so it is loaded on completion here
+        destination = parameters.get(name)
+        if isinstance(destination, QgsProcessingOutputLayerDefinition) and destination.destinationProject is not None:
+            details = QgsProcessingContext.LayerDetails(layer_name, destination.destinationProject, name)
+            context.addLayerToLoadOnCompletion(path, details)
+        return writer, path
+
+    def findUnchangedFeatures(
+        self, input_layer, previous_result, previous_report, ident_name, weighted_fields, report_names, feedback
+    ):
+        """
+        Match input features to the previous Result and Report by the identifier field and return
+        {input_feat_id: (previous Result fid, [previous Report fids])} for the features whose geometry is
+        topologically equal to the previous one. Identifiers that are not unique are always recomputed.
+        """
+        if not ident_name:
+            raise QgsProcessingException("Incremental mode needs an Identifier Field for Report to match features.")
+        if previous_report is None:
+            raise QgsProcessingException("Incremental mode needs the previous Report as Layer as well.")
+        for layer, names in ((previous_result, [ident_name] + weighted_fields), (previous_report, report_names)):
+            missing = [name for name in names if layer.fields().lookupField(name) < 0]
+            if missing:
+                raise QgsProcessingException(f"{layer.name()} has no field(s) {', '.join(missing)}.")
+        if previous_result.crs() != input_layer.crs():
+            feedback.reportError("Previous Result is not in the CRS of the Input Layer, recomputing every feature\n")
+            return {}
+
+        def featureIds(layer):
+            fids = {}
+            request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+            request.setSubsetOfAttributes([ident_name], layer.fields())
+            for feat in layer.getFeatures(request):
+                fids.setdefault(pyValue(feat[ident_name]), []).append(feat.id())
+            return fids
+
+        result_fids = featureIds(previous_result)
+        report_fids = featureIds(previous_report)
+
+        unchanged = {}
+        input_count = collections.Counter()
+        unchanged_idents = {}
+        request = QgsFeatureRequest().setSubsetOfAttributes([ident_name], input_layer.fields())
+        for current, input_feat in enumerate(input_layer.getFeatures(request)):
             if feedback.isCanceled():
                 return {}
+            ident = pyValue(input_feat[ident_name])
+            input_count[ident] += 1
+            fids = result_fids.get(ident, [])
+            if len(fids) != 1 or not input_feat.hasGeometry():
+                continue
+            previous_geom = previous_result.getFeature(fids[0]).geometry()
+            input_geom = input_feat.geometry()
+            if previous_geom.boundingBox() == input_geom.boundingBox() and previous_geom.isGeosEqual(input_geom):
+                unchanged[current + 1] = (fids[0], sorted(report_fids.get(ident, [])))
+                unchanged_idents[current + 1] = ident
+
+        # an identifier used twice in the input cannot be carried over for either feature
+        for input_feat_id, ident in unchanged_idents.items():
+            if input_count[ident] > 1:
+                del unchanged[input_feat_id]
+
+        feedback.pushInfo(
+            f"Incremental mode: {len(unchanged)} feature(s) carried over, "
+            f"{sum(input_count.values()) - len(unchanged)} new or edited feature(s) recomputed, "
+            f"{len(set(result_fids) - set(input_count))} deleted feature(s) dropped\n"
+        )
+        return unchanged
 
-            with tempfile.TemporaryDirectory() as td:
-                f_name = os.path.join(td, "report_df.csv")
+    def clipInParallel(self, input_layer, overlay_index, workers, unchanged, stats):
+        """
+        Clip the input features in a pool of worker processes. The input layer is cut into ranges of
+        consecutive input_feat_id, each sent with the overlay candidates it can reach. Results are
+        yielded in input_feat_id order, so the outputs are identical to a serial run. Features listed
+        in unchanged are not clipped and are yielded with None pieces. The clipping stats of the
+        workers are added to stats.
+        """
+        executable = pythonExecutable()
+        partition_size = max(1, min(1000, input_layer.featureCount() // (workers * 4) + 1))
+        # the spawn executable is global to the QGIS process, it is only changed while the pool runs
+        previous_executable = multiprocessing.spawn.get_executable()
+        mp_context = multiprocessing.get_context("spawn")
+        mp_context.set_executable(executable)
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context)
+        pending = collections.deque()
+
+        def submit(partition, features):
+            features_to_clip = [
+                (input_feat_id, input_feat)
+                for input_feat_id, input_feat in features
+                if input_feat_id not in unchanged and input_feat.hasGeometry()
+            ]
+            candidates = set()
+            for input_feat_id, input_feat in features_to_clip:
+                candidates.update(overlay_index.intersects(input_feat.geometry().boundingBox()))
+            overlay_features = [
+                (overlay_fid, bytes(overlay_index.geometry(overlay_fid).asWkb())) for overlay_fid in sorted(candidates)
+            ]
+            input_features = [
+                (input_feat_id, bytes(input_feat.geometry().asWkb())) for input_feat_id, input_feat in features_to_clip
+            ]
+            future = executor.submit(clipPartition, (partition, input_features, overlay_features))
+            pending.append((features, future))
+
+        def collect():
+            features, future = pending.popleft()
+            partition, clipped, partition_stats = future.result()
+            stats.update(partition_stats)
+            clipped = dict(clipped)
+            for input_feat_id, input_feat in features:
+                if input_feat_id in unchanged:
+                    yield input_feat_id, input_feat, None
+                else:
+                    pieces = clipped.get(input_feat_id, [])
+                    yield input_feat_id, input_feat, [(overlay_fid, geometryFromWkb(wkb)) for overlay_fid, wkb in pieces]
 
-                report_layer = context.takeResultLayer(outputs["DropGeometries"]["OUTPUT"])
+        try:
+            partition = 0
+            features = []
+            for current, input_feat in enumerate(input_layer.getFeatures()):
+                features.append((current + 1, input_feat))
+                if len(features) >= partition_size:
+                    submit(partition, features)
+                    partition += 1
+                    features = []
+                    if len(pending) >= workers * 2:
+                        yield from collect()
+            if features:
+                submit(partition, features)
+            while pending:
+                yield from collect()
+        except BrokenProcessPool as e:
+            raise QgsProcessingException(f"A worker process of the parallel mode failed. {e}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            mp_context.set_executable(previous_executable)
+
+    def importPandas(self, feedback):
+        """Import pandas, installing it to the QGIS python when missing. Returns None on failure"""
+        try:
+            try:
+                import pandas as pd
+            except ImportError:
+                feedback.pushInfo("Python library pandas was not found. Installing pandas to QGIS python ...")
+                import pathlib as pl
+                import subprocess
 
-                QgsVectorFileWriter.writeAsVectorFormat(
-                    report_layer,
-                    f_name,
-                    fileEncoding="utf-8",
-                    driverName="CSV",
-                )
+                qgis_Path = pl.Path(sys.executable)
+                qgis_python_path = (qgis_Path.parent / "python3.exe").as_posix()
 
-                df = pd.read_csv(f_name)
+                subprocess.check_call([qgis_python_path, "-m", "pip", "install", "--user", "pandas"])
+                import pandas as pd
 
-            total_FIDs = df["input_feat_id"].max()
-            ident_name = parameters["identifierfieldforreport"]
-            html = ""
-            df.sort_values(by="area_prcnt", ascending=False, inplace=True)
-            pd.set_option("display.float_format", "{:.5f}".format)
-
-            for i in range(1, total_FIDs + 1):
-                df_sub = df.loc[df["input_feat_id"] == i]
-                df_sub.reset_index(inplace=True, drop=True)
-                avg_value = df_sub.at[0, weighted_field]
-                if ident_name:
-                    feature_name = df_sub.at[0, ident_name]
-                    df_sub.drop(
-                        columns=["input_feat_id", ident_name, weighted_field],
-                        inplace=True,
-                    )
-                    html += f"<p><b>{i}. {feature_name}</b><br>{weighted_field}: {avg_value}<br>count of distinct intersecting features: {len(df_sub.index)}<br></p>\n"
-                else:
-                    df_sub.drop(columns=["input_feat_id", weighted_field], inplace=True)
-                    html += f"<p><b>Feature ID: {i}</b><br>{weighted_field}: {avg_value}<br>count of distinct intersecting features: {len(df_sub.index)}<br></p>\n"
-                html += f"{df_sub.to_html(bold_rows=False, index=False, na_rep='Null',justify='left')}<br>\n"
-
-                with codecs.open(output_file, "w", encoding="utf-8") as f:
-                    f.write("<html><head>\n")
-                    f.write(
-                        '<meta http-equiv="Content-Type" content="text/html; \
-                            charset=utf-8" /></head><body>\n'
-                    )
-                    f.write(html)
-                    f.write("</body></html>\n")
+                feedback.pushInfo("Python library pandas was successfully installed for QGIS python")
+        except:
+            feedback.reportError(
+                "Failed to import pandas. Tried installing pandas but failed.\nPlease manually install pandas for the python that comes with your QGIS.",
+                True,
+            )
+            return None
 
-                results["reportasHTML"] = output_file
+        return pd
 
-        return results
+    def writeHtmlReport(self, pd, dfs, output_file, ident_name, weighted_fields, page_size=0):
+        """
+        Write the HTML report from a single sort and groupby pass over each report table of dfs.
+        Sections are streamed to the file, or to its pages if page_size is above 0.
+        """
+        report = htmlReport(output_file, page_size, weighted_fields)
+        try:
+            for df in dfs:
+                self.writeHtmlSections(pd, report, df, ident_name, weighted_fields)
+        finally:
+            report.close()
+
+    def writeHtmlSections(self, pd, report, df, ident_name, weighted_fields):
+        """
+        Add one report section per input feature of df to an open HTML report. The rows of an input
+        feature must not be split across calls, so the report can be written chunk by chunk.
+        """
+        pd.set_option("display.float_format", "{:.5f}".format)
+        df = df.sort_values(by=["input_feat_id", "area_prcnt"], ascending=[True, False], kind="mergesort")
+
+        if ident_name:
+            drop_columns = ["input_feat_id", ident_name] + weighted_fields
+        else:
+            drop_columns = ["input_feat_id"] + weighted_fields
+        table_columns = [column for column in df.columns if column not in drop_columns]
+
+        for i, df_sub in df.groupby("input_feat_id", sort=True):
+            weighted_values = [df_sub[weighted_field].iat[0] for weighted_field in weighted_fields]
+            avg_values = "".join(
+                f"{weighted_field}: {value}<br>" for weighted_field, value in zip(weighted_fields, weighted_values)
+            )
+            if ident_name:
+                feature_name = df_sub[ident_name].iat[0]
+                title = f"{i}. {feature_name}"
+                section = f"<p><b>{i}. {feature_name}</b><br>{avg_values}count of distinct intersecting features: {len(df_sub.index)}<br></p>\n"
+            else:
+                title = f"Feature ID: {i}"
+                section = f"<p><b>Feature ID: {i}</b><br>{avg_values}count of distinct intersecting features: {len(df_sub.index)}<br></p>\n"
+            section += (
+                f"{df_sub[table_columns].to_html(bold_rows=False, index=False, na_rep='Null',justify='left')}<br>\n"
+            )
+            weighted_values = [None if pd.isna(value) else value for value in weighted_values]
+            report.addSection(i, title, weighted_values, section)
 
     def name(self):
         """
@@ -596,20 +2128,58 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
 <h3>Input Layer</h3>
 <p>Polygon layer for which area weighted average will be calculated.</p>
 <h3>Overlay Layer</h3>
-<p>Polygon layer with source data. Must overlap the Input Layer.</p>
+<p>Polygon layer with source data. Must overlap the Input Layer. Not needed when an Overlay Raster is given.</p>
 <h3>Field to Average</h3>
-<p>Single numeric field in the Overlay Layer.</p>
+<p>One or more numeric fields in the Overlay Layer. The intersection is computed once and a weighted_&lt;field&gt; attribute is added for each field.</p>
 <h3>Identifier Field for Report [optional]</h3>
 <p>Name or ID field in the Input Layer. This field will be used to identify features in the report.</p>
 <h3>Additional Fields to Keep for Report [optional]</h3>
 <p>Fields in the Overlay Layer that will be included in the reports.</p>
+<h3>Additional Overlay Layers and Field to Average of each Additional Overlay Layer [optional]</h3>
+<p>More overlay polygon layers averaged in the same run, for example soils, land cover and zoning for the same parcels. Give one numeric field per layer, in the order of the layers, separated by ";". The Input Layer is read once and its ids and areas are computed once: every input feature is clipped against each overlay in the same pass, and the Result gets one weighted_&lt;field&gt; attribute per additional overlay, prefixed with the layer name if the field name is already taken. Their fragments are measured and the sliver thresholds are applied to them like to those of the Overlay Layer. The Report covers the Overlay Layer only. Setting them runs the Fast Engine; Incremental Mode, Streaming Chunk Size, Worker Processes and the vectorized geometry backend are not available with them.</p>
+<h3>Fast Engine [optional]</h3>
+<p>Compute the average in a single pass over the Input Layer: each feature is clipped against spatially indexed Overlay Layer features and the outputs are written directly, without intermediate layers. Input features lying within the overlay features they intersect skip the intersection and count with their own area; the number of such features is written to the log. Outputs are the same as the default processing chain.</p>
+<h3>Area Calculation [optional]</h3>
+<p>How areas are measured. Layer CRS measures them in the CRS of the Input Layer, as area($geometry) does. Equal-area CRS measures every input feature and fragment in a Lambert azimuthal equal-area CRS centred on the Input Layer. Ellipsoidal areas measures them on the ellipsoid of the project, or of the Input Layer CRS if the project has none. Both run the Fast Engine, measure all fragments of an input feature at once with NumPy and give square meters. Only transformed copies are measured: Result and Report keep the Input Layer CRS and geometries, and the processing context is not changed. Both give correct areas for geographic CRS and continental extents.</p>
+<h3>Minimum Fragment Area and Minimum Fragment Percentage of Input Feature Area [optional]</h3>
+<p>Fragments of the intersection smaller than this area, or than this percentage of the area of their input feature, are treated as slivers of misaligned boundaries right after clipping, so they never reach the averages, the Report as Layer or the Report as HTML. The number of slivers and the area they account for are written to the log. 0 keeps every fragment.</p>
+<h3>Sliver Fragments [optional]</h3>
+<p>Drop removes the slivers: the area they cover counts as not covered by the overlay. Fold into the largest fragment adds their area to the largest remaining fragment of the same input feature, so the weights still cover the same area; it runs the Fast Engine.</p>
+<h3>Approximate Mode Cell Size (Overlay Layer units) [optional]</h3>
+<p>When above 0, the Fields to Average are rasterized at this cell size and every input feature is weighted by the fractions of the cells it covers instead of being intersected with the overlay polygons. Much faster for very dense overlays. An approx_error_&lt;field&gt; attribute gives, for each input feature, a bound of the difference to the exact result: only cells crossed by an overlay boundary can hold a wrong value, and each of them by at most the range of the field values extended to 0, since a cell on the outer boundary of the overlay is partly uncovered. Report as Layer and Report as HTML are not produced.</p>
+<h3>Overlay Raster (Approximate Mode) [optional]</h3>
+<p>Raster layer used directly as the overlay source, in approximate mode. A weighted_band&lt;n&gt; attribute is added for each band to average.</p>
+<h3>Raster Bands to Average [optional]</h3>
+<p>Bands of the Overlay Raster to average. All bands by default.</p>
+<h3>Previous Result and Previous Report as Layer (Incremental Mode) [optional]</h3>
+<p>Outputs of an earlier run on a previous version of the Input Layer. Features are matched with the Identifier Field for Report: features whose geometry did not change are copied from the previous outputs, edited and new features are recomputed and deleted features are dropped. Both layers and the Identifier Field are required; setting them runs the Fast Engine.</p>
+<h3>Intersection Cache Folder (Fast Engine) [optional]</h3>
+<p>Folder where the clipped pieces of the Input and Overlay Layers are stored, keyed on the geometries and CRS of both layers. A rerun on unchanged layers, for example with other fields to average, reads the pieces back and skips the overlay. Setting a folder runs the Fast Engine.</p>
+<h3>Intersection Cache Size Limit (MB) [optional]</h3>
+<p>Maximum size of the cache folder. The least recently used entries are removed first.</p>
+<h3>Geometry Backend (Fast Engine) [optional]</h3>
+<p>QGIS clips every input feature on its own. Shapely 2 / NumPy (vectorized, requires shapely 2.0 or later) loads the Overlay Layer once as a Shapely array, then intersects blocks of input features with a bulk STRtree query and array operations, and sums the weighted values with NumPy; the Streaming Chunk Size sets the block size. Invalid input and overlay geometries are repaired with make_valid before the intersection. Outputs go to the same Result and Report as Layer. Areas are computed by Shapely when they are planar in the layer CRS, and measured by QGIS otherwise. Worker Processes are not used. Selecting it runs the Fast Engine.</p>
+<h3>Worker Processes (Fast Engine) [optional]</h3>
+<p>Number of processes clipping the Input Layer in parallel. Values above 1 run the Fast Engine on ranges of input features in separate processes; results are merged in input order and are identical to a run with a single process. The processes run the Python interpreter of the QGIS installation; the algorithm stops with an error if none is found.</p>
+<h3>Bulk Output Batch Size (Fast Engine) [optional]</h3>
+<p>When above 0, Result and Report as Layer are written in batches of this many features. GeoPackage files (.gpkg) are written with one transaction per batch and GeoParquet files (.parquet, requires pyarrow) with one row group per batch, the text Additional Fields being dictionary encoded. Other destinations receive their features in batches. The throughput of each output is written to the log.</p>
+<h3>Streaming Chunk Size (Fast Engine) [optional]</h3>
+<p>Number of input features processed at a time. When above 0, only the overlay features under the bounding boxes of the input features of the current chunk are loaded and the Result and Report rows are written as each chunk finishes, so memory use depends on the chunk size rather than on the size of the layers. Save the outputs to files, temporary layers are held in memory. Spatially sorted input layers share more overlay features within a chunk and load them fewer times. Streaming runs in a single process. 0 loads the whole overlay layer at once.</p>
+<h3>Report as Attribute Table (no geometry) [optional]</h3>
+<p>Write Report as Layer as a table without geometry, with a 32 bit input_feat_id and plain double areas. Fragment areas are summed in one pass instead of collecting the fragment geometries and computing area_crs_units and area_prcnt over them, so the report is much smaller and faster to write.</p>
+<h3>Stage Profile [optional]</h3>
+<p>JSON file with the wall time, feature counts in and out, vertex counts and peak memory of every stage of the run. The same table, without vertex counts unless this file is saved, is always written to the log. Peak memory is per stage on Linux and the peak of the whole process elsewhere.</p>
 <h2>Outputs</h2>
 <h3>Result</h3>
-<p>Input layer but with the additional attribute of field to average.</p>
+<p>Input layer, with its original geometries, but with the additional attribute of field to average. Features that do not intersect the Overlay Layer get a NULL value.</p>
 <h3>Report as Layer</h3>
 <p>Report of the analysis as a GIS layer.</p>
 <h3>Report as HTML [optional]</h3>
 <p>Report of the analysis as text tables.</p>
+<h3>Report as HTML Features per Page [optional]</h3>
+<p>When above 0, the sections of Report as HTML are written to pages of this many input features, in a &lt;name&gt;_pages folder next to it, and Report as HTML becomes an index page with the weighted values of every input feature and a link to its section. Each page opens quickly whatever the number of features. With the Fast Engine, pages are written as input features are processed, so memory use does not grow with the number of features; the processing chain keeps its report in memory and sorts it by input feature before writing the pages. 0 writes a single file.</p>
+<h3>Areal Weight Matrix (Fast Engine) [optional]</h3>
+<p>Sparse matrix of the area of every Input Layer feature falling in every Overlay Layer feature, saved as a NumPy archive. Use it with the Apply Area Weights algorithm to average other attributes of an unchanged Overlay Layer geometry without a new overlay. Setting this output runs the Fast Engine.</p>
 <p align="right">Algorithm author: Abdul Raheem Siddiqui</p>
 <p align="right">Help author: Abdul Raheem Siddiqui</p>
 <p align="right">Algorithm version: {PLUGIN_VERSION}</p>
@@ -622,21 +2192,21 @@ class AreaWeightedAverageAlgorithm(QgsProcessingAlgorithm):
         return "mailto:ars.work.ce@gmail.com"
 
     def postProcessAlgorithm(self, context, feedback):
+        # nothing to do without a GUI (qgis_process, standalone scripts) or for a child algorithm, which is
+        # post processed outside the main thread
+        app = QCoreApplication.instance()
+        if qgis.utils.iface is None or app is None or QThread.currentThread() != app.thread():
+            return {}
+
         try:  # try-except because trivial features
             counter = incrementUsageCounter()
 
-            # check if counter is milestone for plugin version check
-            if (counter) % 4 == 0:
-                checkPluginUptodate("Area Weighted Average")
-
-            # check if counter is milestone for usage message
-            if (counter) % 25 == 0:
-                displayUsageMessage(counter)
+            # check if counter is milestone for plugin version check, run after the results are handed over
+            if counter % 4 == 0:
+                queueVersionCheck()
 
-            # check if plugin is registered
-            if not getRegistrationStatus():
-                form = RegisterForm("Register Area Weighted Average", REGISTRATION_FORM_LINK, REGISTRATION_FORM_ENRIES)
-                form.show()
+            # dialogs and messages wait until the results have been handed over
+            QTimer.singleShot(0, lambda: showPostRunMessages(counter))
 
         except Exception as e:
             feedback.reportError(
@@ -0,0 +1,208 @@
+
+__revision__ = "$Format:%H$"
+
+import os
+import inspect
+
+import numpy as np
+
+from area_weighted_average.processing.config import PLUGIN_VERSION
+from area_weighted_average.processing.weight_matrix import applyWeights, loadWeightMatrix
+
+from qgis.PyQt.QtGui import QIcon
+from qgis.PyQt.QtCore import QCoreApplication, QVariant
+from qgis.core import (
+    QgsProcessing,
+    QgsFeature,
+    QgsFeatureRequest,
+    QgsFeatureSink,
+    QgsField,
+    QgsFields,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterField,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterVectorLayer,
+)
+
+
+class ApplyAreaWeightsAlgorithm(QgsProcessingAlgorithm):
+    """
+    Companion of the Area Weighted Average algorithm. Reads the areal weight matrix exported by its
+    Fast Engine and averages overlay attributes with a sparse matrix-vector product, without any
+    geometric overlay.
+    """
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterFile(
+                "weightmatrix",
+                "Areal Weight Matrix",
+                extension="npz",
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "inputlayer",
+                "Input Layer",
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                "overlaylayer",
+                "Overlay Layer (Data Source)",
+                types=[QgsProcessing.TypeVectorPolygon],
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                "fieldtoaverage",
+                "Field to Average",
+                type=QgsProcessingParameterField.Numeric,
+                parentLayerParameterName="overlaylayer",
+                allowMultiple=True,
+                defaultValue=None,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSink(
+                "result",
+                "Result",
+                type=QgsProcessing.TypeVectorAnyGeometry,
+                createByDefault=True,
+                defaultValue=None,
+            )
+        )
+
+    def processAlgorithm(self, parameters, context, feedback):
+        input_layer = self.parameterAsVectorLayer(parameters, "inputlayer", context)
+        overlay_layer = self.parameterAsVectorLayer(parameters, "overlaylayer", context)
+        fields_to_average = self.parameterAsFields(parameters, "fieldtoaverage", context)
+        matrix = loadWeightMatrix(self.parameterAsFile(parameters, "weightmatrix", context))
+
+        # rows of the matrix are the input features in iteration order
+        request = QgsFeatureRequest().setNoAttributes().setFlags(QgsFeatureRequest.NoGeometry)
+        input_fids = np.array([feat.id() for feat in input_layer.getFeatures(request)], dtype=np.int64)
+        if not np.array_equal(input_fids, matrix["input_fids"]):
+            raise QgsProcessingException("Input Layer features do not match the rows of the Areal Weight Matrix.")
+        if str(matrix["crs"]) != input_layer.crs().toWkt():
+            feedback.reportError("CRS of the Input Layer differs from the CRS the Areal Weight Matrix was built in\n")
+
+        # one value vector per field, NaN for NULL, ordered like the matrix columns
+        columns = {overlay_fid: column for column, overlay_fid in enumerate(matrix["overlay_fids"].tolist())}
+        values = np.full((len(fields_to_average), len(columns)), np.nan)
+        found = 0
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry)
+        request.setSubsetOfAttributes(fields_to_average, overlay_layer.fields())
+        for overlay_feat in overlay_layer.getFeatures(request):
+            if feedback.isCanceled():
+                return {}
+            column = columns.get(overlay_feat.id())
+            if column is None:
+                continue
+            found += 1
+            for row, field in enumerate(fields_to_average):
+                value = overlay_feat[field]
+                if value is not None and not (isinstance(value, QVariant) and value.isNull()):
+                    values[row, column] = float(value)
+        if found != len(columns):
+            raise QgsProcessingException(
+                f"{len(columns) - found} Overlay Layer feature(s) of the Areal Weight Matrix are missing from the Overlay Layer."
+            )
+
+        averages = [applyWeights(matrix, field_values) for field_values in values]
+
+        weighted_fields = ["weighted_" + field for field in fields_to_average]
+        result_fields = QgsFields(input_layer.fields())
+        for weighted_field in weighted_fields:
+            result_fields.append(QgsField(weighted_field, QVariant.Double))
+        (sink, dest_id) = self.parameterAsSink(
+            parameters, "result", context, result_fields, input_layer.wkbType(), input_layer.crs()
+        )
+
+        total = 100.0 / len(input_fids) if len(input_fids) else 0
+        for row, input_feat in enumerate(input_layer.getFeatures()):
+            if feedback.isCanceled():
+                return {}
+            feedback.setProgress(int(row * total))
+            weighted_values = [None if np.isnan(average[row]) else float(average[row]) for average in averages]
+            result_feat = QgsFeature(result_fields)
+            result_feat.setGeometry(input_feat.geometry())
+            result_feat.setAttributes(input_feat.attributes() + weighted_values)
+            sink.addFeature(result_feat, QgsFeatureSink.FastInsert)
+
+        return {"result": dest_id}
+
+    def name(self):
+        """
+        Returns the algorithm name, used for identifying the algorithm. This
+        string should be fixed for the algorithm, and must not be localised.
+        The name should be unique within each provider. Names should contain
+        lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return "Apply Area Weights"
+
+    def displayName(self):
+        """
+        Returns the translated algorithm name, which should be used for any
+        user-visible display of the algorithm name.
+        """
+        return self.tr(self.name())
+
+    def group(self):
+        """
+        Returns the name of the group this algorithm belongs to. This string
+        should be localised.
+        """
+        return self.tr(self.groupId())
+
+    def groupId(self):
+        """
+        Returns the unique ID of the group this algorithm belongs to. This
+        string should be fixed for the algorithm, and must not be localised.
+        The group id should be unique within each provider. Group id should
+        contain lowercase alphanumeric characters only and no spaces or other
+        formatting characters.
+        """
+        return ""
+
+    def tr(self, string):
+        return QCoreApplication.translate("Processing", string)
+
+    def createInstance(self):
+        return ApplyAreaWeightsAlgorithm()
+
+    def icon(self):
+        cmd_folder = os.path.split(inspect.getfile(inspect.currentframe()))[0]
+        icon = QIcon(os.path.join(os.path.join(os.path.dirname(cmd_folder), "icon.png")))
+        return icon
+
+    def shortHelpString(self):
+        return f"""<html><body>
+<h2>Algorithm Description</h2>
+<p>This algorithm calculates area weighted averages from the Areal Weight Matrix exported by the Area Weighted Average algorithm. The averages are computed as sparse matrix products, so new attribute values of an Overlay Layer whose geometry did not change are averaged without a new spatial overlay.</p>
+<h2>Input Parameters</h2>
+<h3>Areal Weight Matrix</h3>
+<p>NumPy archive written by the Areal Weight Matrix output of the Area Weighted Average algorithm.</p>
+<h3>Input Layer</h3>
+<p>Polygon layer the matrix was built for. Its features must be unchanged.</p>
+<h3>Overlay Layer</h3>
+<p>Polygon layer the matrix was built for. Attributes may differ, feature geometries and ids must be unchanged.</p>
+<h3>Field to Average</h3>
+<p>One or more numeric fields in the Overlay Layer.</p>
+<h2>Outputs</h2>
+<h3>Result</h3>
+<p>Input layer with one weighted_&lt;field&gt; attribute per field to average. Features that do not intersect the Overlay Layer get NULL values.</p>
+<p align="right">Algorithm author: Abdul Raheem Siddiqui</p>
+<p align="right">Algorithm version: {PLUGIN_VERSION}</p>
+<p align="right">Contact email: ars.work.ce@gmail.com</p>
+</body></html>"""
+
+    def helpUrl(self):
+        return "mailto:ars.work.ce@gmail.com"
@@ -0,0 +1,204 @@
+__revision__ = "$Format:%H$"
+
+import abc
+import math
+import struct
+
+import numpy as np
+
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsDistanceArea,
+    QgsEllipsoidUtils,
+    QgsGeometry,
+    QgsWkbTypes,
+)
+
+# flat WKB types holding polygon rings
+WKB_POLYGON = 3
+WKB_MULTIPOLYGON = 6
+
+
+def polygonRings(wkb):
+    """
+    Rings of a WKB Polygon or MultiPolygon, with or without Z and M, as (exterior, x, y) triples in
+    WKB order. Any other geometry type has no ring.
+    """
+    rings = []
+
+    def readGeometry(offset):
+        endian = "<" if wkb[offset] == 1 else ">"
+        (wkb_type,) = struct.unpack_from(endian + "I", wkb, offset + 1)
+        offset += 5
+        # ISO types, and the 0x80000000 Z and 0x40000000 M flags of the 2.5D types
+        extra_dims = bool(wkb_type & 0x80000000) + bool(wkb_type & 0x40000000)
+        wkb_type &= 0x0FFFFFFF
+        flat_type = wkb_type % 1000
+        dims = 2 + extra_dims + {0: 0, 1: 1, 2: 1, 3: 2}.get(wkb_type // 1000, 0)
+        if flat_type == WKB_MULTIPOLYGON:
+            (count,) = struct.unpack_from(endian + "I", wkb, offset)
+            offset += 4
+            for _ in range(count):
+                offset = readGeometry(offset)
+            return offset
+        if flat_type != WKB_POLYGON:
+            return len(wkb)
+        (ring_count,) = struct.unpack_from(endian + "I", wkb, offset)
+        offset += 4
+        for ring in range(ring_count):
+            (point_count,) = struct.unpack_from(endian + "I", wkb, offset)
+            offset += 4
+            coords = np.frombuffer(wkb, dtype=endian + "f8", count=point_count * dims, offset=offset)
+            coords = coords.reshape(point_count, dims)
+            rings.append((ring == 0, coords[:, 0], coords[:, 1]))
+            offset += point_count * dims * 8
+        return offset
+
+    if wkb:
+        readGeometry(0)
+    return rings
+
+
+class AreaMeasure(abc.ABC):
+    """
+    Measures areas of geometries one by one or, with areas, a list at a time. Subclasses that gather
+    the ring coordinates of all geometries of the list compute their areas with NumPy in one pass.
+    key identifies how areas are measured, measures with the same key give the same areas.
+    """
+
+    def __call__(self, geometry):
+        return float(self.areas([geometry])[0])
+
+    @abc.abstractmethod
+    def areas(self, geometries):
+        """Areas of a list of geometries as a float64 array, 0 for a missing or non-polygonal one"""
+
+
+class DistanceAreaMeasure(AreaMeasure):
+    """Areas measured the way area($geometry) does inside processing, with the context ellipsoid and unit"""
+
+    def __init__(self, crs, context):
+        self.calculator = QgsDistanceArea()
+        self.calculator.setSourceCrs(crs, context.transformContext())
+        self.calculator.setEllipsoid(context.ellipsoid())
+        self.area_unit = context.areaUnit() if hasattr(context, "areaUnit") else None
+        self.key = f"{type(self).__name__}:{context.ellipsoid()}:{self.area_unit}"
+
+    def __call__(self, geometry):
+        area = self.calculator.measureArea(geometry)
+        if self.area_unit is not None:
+            area = self.calculator.convertAreaMeasurement(area, self.area_unit)
+        return area
+
+    def areas(self, geometries):
+        return np.array([self(geometry) for geometry in geometries], dtype=np.float64)
+
+
+class RingAreaMeasure(AreaMeasure):
+    """
+    Base of the vectorized measures: geometries are transformed to a target CRS, their rings are read
+    from WKB and ringAreas computes the area of every ring at once. Polygon areas are the exterior
+    ring areas less the hole areas, in square meters.
+    """
+
+    def __init__(self, crs, target_crs, transform_context):
+        self.transform = QgsCoordinateTransform(crs, target_crs, transform_context)
+        self.key = f"{type(self).__name__}:{target_crs.toWkt()}"
+
+    def areas(self, geometries):
+        xs, ys, ring_lengths, ring_signs, ring_owners = [], [], [], [], []
+        for position, geometry in enumerate(geometries):
+            if geometry is None or geometry.isNull() or geometry.type() != QgsWkbTypes.PolygonGeometry:
+                continue
+            geometry = QgsGeometry(geometry)
+            if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+                geometry = QgsGeometry(geometry.constGet().segmentize())
+            geometry.transform(self.transform)
+            for exterior, x, y in polygonRings(bytes(geometry.asWkb())):
+                if len(x) < 3:
+                    continue
+                xs.append(x)
+                ys.append(y)
+                ring_lengths.append(len(x))
+                ring_signs.append(1.0 if exterior else -1.0)
+                ring_owners.append(position)
+
+        areas = np.zeros(len(geometries))
+        if not ring_lengths:
+            return areas
+        ring_lengths = np.array(ring_lengths)
+        starts = np.concatenate(([0], np.cumsum(ring_lengths)[:-1]))
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        # every vertex is paired with the previous vertex of its ring, the first with the last
+        previous = np.arange(len(x)) - 1
+        previous[starts] = starts + ring_lengths - 1
+        ring_areas = self.ringAreas(x[previous], y[previous], x, y, starts)
+        np.add.at(areas, np.array(ring_owners), np.array(ring_signs) * ring_areas)
+        return np.maximum(areas, 0.0)
+
+    @abc.abstractmethod
+    def ringAreas(self, x1, y1, x2, y2, starts):
+        """Area of every ring from its edges (x1, y1) to (x2, y2), rings begin at the starts offsets"""
+
+
+class EqualAreaMeasure(RingAreaMeasure):
+    """Planar areas in an equal-area CRS, the geometries themselves are not changed"""
+
+    def ringAreas(self, x1, y1, x2, y2, starts):
+        return np.abs(np.add.reduceat(x1 * y2 - x2 * y1, starts)) / 2
+
+
+class EllipsoidalMeasure(RingAreaMeasure):
+    """
+    Areas on an ellipsoid with the series of QgsDistanceArea.computePolygonArea, evaluated for all
+    edges of all rings at once.
+    """
+
+    def __init__(self, crs, ellipsoid, transform_context):
+        parameters = QgsEllipsoidUtils.ellipsoidParameters(ellipsoid)
+        if not parameters.valid:
+            raise ValueError(f"Unknown ellipsoid {ellipsoid}")
+        super().__init__(crs, parameters.crs, transform_context)
+        self.ellipsoid = ellipsoid
+        a2 = parameters.semiMajor * parameters.semiMajor
+        e2 = 1 - (parameters.semiMinor * parameters.semiMinor) / a2
+        e4 = e2 * e2
+        e6 = e4 * e2
+        self.ae = a2 * (1 - e2)
+        self.q = (2.0 / 3.0 * e2, 3.0 / 5.0 * e4, 4.0 / 7.0 * e6)
+        self.qbar = (
+            -1.0 - 2.0 / 3.0 * e2 - 3.0 / 5.0 * e4 - 4.0 / 7.0 * e6,
+            2.0 / 9.0 * e2 + 2.0 / 5.0 * e4 + 4.0 / 7.0 * e6,
+            -3.0 / 25.0 * e4 - 12.0 / 35.0 * e6,
+            4.0 / 49.0 * e6,
+        )
+        self.qp = float(self.getQ(np.array(math.pi / 2)))
+        self.e = abs(4 * math.pi * self.qp * self.ae)
+
+    def getQ(self, y):
+        qa, qb, qc = self.q
+        sin = np.sin(y)
+        sin2 = sin * sin
+        return sin * (1 + sin2 * (qa + sin2 * (qb + sin2 * qc)))
+
+    def getQbar(self, y):
+        qbar_a, qbar_b, qbar_c, qbar_d = self.qbar
+        cos = np.cos(y)
+        cos2 = cos * cos
+        return cos * (qbar_a + cos2 * (qbar_b + cos2 * (qbar_c + cos2 * qbar_d)))
+
+    def ringAreas(self, x1, y1, x2, y2, starts):
+        x1, y1, x2, y2 = np.radians(x1), np.radians(y1), np.radians(x2), np.radians(y2)
+        # edges crossing the antimeridian take the short way round
+        dx = np.remainder(x2 - x1 + math.pi, 2 * math.pi) - math.pi
+        dy = y2 - y1
+        q2 = self.getQ(y2)
+        terms = dx * (self.qp - q2)
+        sloped = np.abs(dy) > 4 * np.finfo(np.float64).eps
+        terms[sloped] += (
+            dx[sloped] * q2[sloped] - dx[sloped] / dy[sloped] * (self.getQbar(y2[sloped]) - self.getQbar(y1[sloped]))
+        )
+        areas = np.abs(np.add.reduceat(terms, starts) * self.ae)
+        areas = np.minimum(areas, self.e)
+        return np.where(areas > self.e / 2, self.e - areas, areas)
@@ -0,0 +1,214 @@
+"""
+Headless batch runner of the Area Weighted Average algorithm.
+
+QGIS, the processing providers and the plugin modules are initialized once per worker process, then
+every job of a manifest is run through AreaWeightedAverageAlgorithm in that long-lived pool. A
+status and timing line per job is written to a CSV or JSON summary.
+
+The manifest is a CSV file with a header or a JSON list of objects. Each job has the keys
+
+    input, overlay         paths or URIs of the polygon layers
+    fields                 fields to average, separated by ";" in CSV files
+    result                 path of the Result layer
+    id                     optional job name, defaults to the job number
+    additional_fields      optional, separated by ";" in CSV files
+    additional_overlays    optional paths or URIs of more overlay layers, separated by ";" in CSV files
+    additional_overlay_fields
+                           field to average of each additional overlay, separated by ";"
+    identifier             optional Identifier Field for Report
+    report                 optional path of the Report as Layer, a temporary layer otherwise
+    html                   optional path of the Report as HTML
+
+Any other key is passed to the algorithm as a parameter of that name, e.g. fastengine or workers.
+
+    python batch_runner.py jobs.csv --workers 4 --summary summary.csv
+"""
+
+__revision__ = "$Format:%H$"
+
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import traceback
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from qgis.core import (
+    QgsProcessing,
+    QgsProcessingContext,
+    QgsProcessingException,
+    QgsProcessingFeedback,
+    QgsProcessingOutputLayerDefinition,
+)
+
+from headless import importAlgorithm, initQgis, runAlgorithm
+
+JOB_KEYS = (
+    "id",
+    "input",
+    "overlay",
+    "fields",
+    "additional_fields",
+    "additional_overlays",
+    "additional_overlay_fields",
+    "identifier",
+    "result",
+    "report",
+    "html",
+)
+SUMMARY_FIELDS = ("id", "status", "seconds", "input", "overlay", "result", "error")
+
+# state of a worker process, set up once by initWorker
+worker = {}
+
+
+class JobFeedback(QgsProcessingFeedback):
+    """Feedback keeping the errors reported by the algorithm for the summary"""
+
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+
+    def reportError(self, error, fatalError=False):
+        self.errors.append(error.strip())
+        super().reportError(error, fatalError)
+
+
+def splitList(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [item.strip() for item in str(value).split(";") if item.strip()]
+
+
+def readManifest(path):
+    """Jobs of a CSV or JSON manifest, as dictionaries"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".json"):
+            jobs = json.load(f)
+            if isinstance(jobs, dict):
+                jobs = jobs["jobs"]
+        else:
+            jobs = list(csv.DictReader(f))
+
+    for number, job in enumerate(jobs, start=1):
+        missing = [key for key in ("input", "overlay", "fields", "result") if not job.get(key)]
+        if missing:
+            raise ValueError(f"Job {number} of {path} has no {', '.join(missing)}")
+        if not job.get("id"):
+            job["id"] = str(number)
+    return jobs
+
+
+def jobParameters(job):
+    """Parameters of AreaWeightedAverageAlgorithm for a job"""
+    parameters = {
+        "inputlayer": job["input"],
+        "overlaylayer": job["overlay"],
+        "fieldtoaverage": splitList(job["fields"]),
+        "additionalfields": splitList(job.get("additional_fields")),
+        "identifierfieldforreport": job.get("identifier") or None,
+        "result": QgsProcessingOutputLayerDefinition(job["result"]),
+        "reportaslayer": QgsProcessingOutputLayerDefinition(job.get("report") or QgsProcessing.TEMPORARY_OUTPUT),
+    }
+    if job.get("html"):
+        parameters["reportasHTML"] = job["html"]
+    if job.get("additional_overlays"):
+        parameters["additionaloverlays"] = splitList(job["additional_overlays"])
+        parameters["additionaloverlayfields"] = ";".join(splitList(job.get("additional_overlay_fields")))
+    for key, value in job.items():
+        if key not in JOB_KEYS and value not in (None, ""):
+            parameters[key] = value
+    return parameters
+
+
+def initWorker():
+    """Initialize QGIS and import the algorithm once for the lifetime of a worker process"""
+    worker["app"] = initQgis()
+    worker["algorithm"] = importAlgorithm()
+
+
+def runJob(job):
+    """Run one job in a worker process and return its summary row"""
+    summary = {key: job.get(key) for key in SUMMARY_FIELDS if key in job}
+    feedback = JobFeedback()
+    start = time.perf_counter()
+    try:
+        algorithm = worker["algorithm"]()
+        algorithm.initAlgorithm()
+        parameters = jobParameters(job)
+        context = QgsProcessingContext()
+        ok, message = algorithm.checkParameterValues(parameters, context)
+        if not ok:
+            raise QgsProcessingException(message)
+        results = runAlgorithm(algorithm, parameters, context, feedback)
+        # layers of the context are released with it, nothing is kept between jobs
+        del context
+        if results:
+            summary.update(status="ok", error="")
+        else:
+            summary.update(status="canceled", error="; ".join(feedback.errors))
+    except Exception as e:
+        summary.update(status="failed", error="; ".join(feedback.errors + [str(e) or traceback.format_exc()]))
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def writeSummary(path, rows):
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1)
+        return
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Run a manifest of Area Weighted Average jobs headlessly")
+    parser.add_argument("manifest", help="CSV or JSON file of jobs")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, each running one job at a time")
+    parser.add_argument("--summary", help="CSV or JSON summary file, next to the manifest by default")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+    jobs = readManifest(args.manifest)
+    summary_path = args.summary or os.path.splitext(args.manifest)[0] + "_summary.csv"
+
+    rows = [None] * len(jobs)
+    start = time.perf_counter()
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, args.workers), mp_context=mp_context, initializer=initWorker) as pool:
+        futures = {pool.submit(runJob, job): position for position, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            position = futures[future]
+            try:
+                rows[position] = future.result()
+            except BrokenProcessPool as e:
+                job = jobs[position]
+                rows[position] = {key: job.get(key) for key in SUMMARY_FIELDS if key in job}
+                rows[position].update(status="failed", seconds=None, error=f"worker process died: {e}")
+            row = rows[position]
+            print(f"[{done}/{len(jobs)}] {row['id']}: {row['status']} {row['seconds'] or 0:.1f} s", flush=True)
+
+    writeSummary(summary_path, rows)
+    failed = sum(1 for row in rows if row["status"] != "ok")
+    print(
+        f"{len(jobs) - failed} of {len(jobs)} job(s) succeeded in {time.perf_counter() - start:.1f} s, "
+        f"summary written to {summary_path}",
+        flush=True,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Synthetic benchmark of the Area Weighted Average algorithm.
+
+Generates input and overlay polygon layers at controlled scales and runs AreaWeightedAverageAlgorithm
+headlessly on them, one case per process, appending wall time, peak RSS and per-stage times to a JSON
+history so runs can be compared across commits. Stage measures come from the Stage Profile output; the
+vertex counting it enables is excluded from the stage times but included in the wall time.
+
+Run it with the Python interpreter of a QGIS installation in which the area_weighted_average plugin is
+installed, for example:
+
+    python benchmark.py --shapes grid voronoi --sizes 1000 10000 --overlap 4
+    python benchmark.py --shapes highvertex --sizes 1000 --vertices 1024 --fast-engine --workers 4
+"""
+
+__revision__ = "$Format:%H$"
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+from datetime import datetime, timezone
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransformContext,
+    QgsFeature,
+    QgsField,
+    QgsFields,
+    QgsGeometry,
+    QgsPointXY,
+    QgsProcessingContext,
+    QgsProcessingFeedback,
+    QgsProcessingOutputLayerDefinition,
+    QgsRectangle,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QVariant
+
+from headless import importAlgorithm, initQgis, runAlgorithm
+from stage_profiler import peakMemory
+
+SHAPES = ("grid", "voronoi", "highvertex")
+CELL_SIZE = 1000.0
+CRS = "EPSG:32633"
+
+cmd_folder = os.path.dirname(os.path.abspath(__file__))
+
+
+def gitCommit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=cmd_folder, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def gridCells(count, extent):
+    """Square cells tiling extent, at least count of them"""
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    width = extent.width() / columns
+    height = extent.height() / rows
+    for row in range(rows):
+        for column in range(columns):
+            x = extent.xMinimum() + column * width
+            y = extent.yMinimum() + row * height
+            yield QgsGeometry.fromRect(QgsRectangle(x, y, x + width, y + height))
+
+
+def voronoiCells(count, extent, rng):
+    """Voronoi cells of count random points, clipped to extent"""
+    points = [
+        QgsPointXY(rng.uniform(extent.xMinimum(), extent.xMaximum()), rng.uniform(extent.yMinimum(), extent.yMaximum()))
+        for _ in range(count)
+    ]
+    bounds = QgsGeometry.fromRect(extent)
+    diagram = QgsGeometry.fromMultiPointXY(points).voronoiDiagram(bounds)
+    for part in diagram.asGeometryCollection():
+        cell = part.intersection(bounds)
+        if not cell.isEmpty():
+            yield cell
+
+
+def highVertexCells(count, extent, vertices):
+    """Grid cells whose boundary is a wave of vertices points, pulled inside the cell so cells never overlap"""
+    for cell in gridCells(count, extent):
+        rect = cell.boundingBox()
+        center = rect.center()
+        radius = min(rect.width(), rect.height()) / 2
+        ring = []
+        for i in range(vertices):
+            angle = 2 * math.pi * i / vertices
+            r = radius * (0.8 + 0.2 * abs(math.sin(8 * angle)))
+            ring.append(QgsPointXY(center.x() + r * math.cos(angle), center.y() + r * math.sin(angle)))
+        yield QgsGeometry.fromPolygonXY([ring])
+
+
+def generateLayer(path, shape, count, extent, vertices, seed, fields, attributes):
+    """Write a polygon GeoPackage of about count synthetic features, unless it already exists"""
+    if os.path.exists(path):
+        return path
+
+    rng = random.Random(seed)
+    if shape == "grid":
+        cells = gridCells(count, extent)
+    elif shape == "voronoi":
+        cells = voronoiCells(count, extent, rng)
+    else:
+        cells = highVertexCells(count, extent, vertices)
+
+    options = QgsVectorFileWriter.SaveVectorOptions()
+    options.driverName = "GPKG"
+    tmp_path = path + ".tmp.gpkg"
+    writer = QgsVectorFileWriter.create(
+        tmp_path,
+        fields,
+        QgsWkbTypes.MultiPolygon,
+        QgsCoordinateReferenceSystem(CRS),
+        QgsCoordinateTransformContext(),
+        options,
+    )
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        raise RuntimeError(f"Could not create {tmp_path}: {writer.errorMessage()}")
+    for i, geom in enumerate(cells):
+        geom.convertToMultiType()
+        feat = QgsFeature(fields)
+        feat.setGeometry(geom)
+        feat.setAttributes(attributes(i, rng))
+        writer.addFeature(feat)
+    del writer
+    os.replace(tmp_path, path)
+    return path
+
+
+def generateCase(workdir, shape, size, overlap, vertices, seed):
+    """Input and overlay layers of a case. The overlay has about overlap features per input feature."""
+    side = math.sqrt(size) * CELL_SIZE
+    extent = QgsRectangle(500000, 5000000, 500000 + side, 5000000 + side)
+
+    input_fields = QgsFields()
+    input_fields.append(QgsField("name", QVariant.String))
+    input_path = os.path.join(workdir, f"input_{shape}_{size}_v{vertices}_s{seed}.gpkg")
+    generateLayer(input_path, shape, size, extent, vertices, seed, input_fields, lambda i, rng: [f"feature {i}"])
+
+    overlay_fields = QgsFields()
+    overlay_fields.append(QgsField("value", QVariant.Double))
+    overlay_fields.append(QgsField("class", QVariant.String))
+    # the overlay is shifted by a fraction of a cell so that grids do not line up with the input
+    offset = CELL_SIZE / (3 * math.sqrt(overlap))
+    overlay_extent = QgsRectangle(
+        extent.xMinimum() - offset, extent.yMinimum() - offset, extent.xMaximum() + offset, extent.yMaximum() + offset
+    )
+    overlay_path = os.path.join(workdir, f"overlay_{shape}_{size}_o{overlap:g}_v{vertices}_s{seed}.gpkg")
+    generateLayer(
+        overlay_path,
+        shape,
+        max(1, round(size * overlap)),
+        overlay_extent,
+        vertices,
+        seed + 1,
+        overlay_fields,
+        lambda i, rng: [rng.uniform(0, 1000), f"class {i % 10}"],
+    )
+    return input_path, overlay_path
+
+
+def runCase(case):
+    """Run one case in this process and return its measures"""
+    app = initQgis()
+
+    AreaWeightedAverageAlgorithm = importAlgorithm()
+
+    input_layer = QgsVectorLayer(case["input"], "input", "ogr")
+    overlay_layer = QgsVectorLayer(case["overlay"], "overlay", "ogr")
+    out_dir = case["outdir"]
+    parameters = {
+        "inputlayer": input_layer,
+        "overlaylayer": overlay_layer,
+        "fieldtoaverage": ["value"],
+        "additionalfields": ["class"],
+        "identifierfieldforreport": "name",
+        "fastengine": case["fast_engine"],
+        "workers": case["workers"],
+        "chunksize": case["chunk_size"],
+        "result": QgsProcessingOutputLayerDefinition(os.path.join(out_dir, "result.gpkg")),
+        "reportaslayer": QgsProcessingOutputLayerDefinition(os.path.join(out_dir, "report.gpkg")),
+    }
+    if case["html"]:
+        parameters["reportasHTML"] = os.path.join(out_dir, "report.html")
+    profile_file = os.path.join(out_dir, "profile.json")
+    parameters["profile"] = profile_file
+
+    algorithm = AreaWeightedAverageAlgorithm()
+    algorithm.initAlgorithm()
+    context = QgsProcessingContext()
+    feedback = QgsProcessingFeedback()
+
+    start = time.perf_counter()
+    results = runAlgorithm(algorithm, parameters, context, feedback)
+    wall_time = time.perf_counter() - start
+
+    measures = {
+        "ok": bool(results),
+        "wall_time": round(wall_time, 4),
+        "peak_rss_mb": peakMemory(),
+        "input_features": input_layer.featureCount(),
+        "overlay_features": overlay_layer.featureCount(),
+        "stages": [],
+    }
+    # per-stage times, counts and memory come from the Stage Profile output of the algorithm
+    if os.path.exists(profile_file):
+        with open(profile_file, encoding="utf-8") as f:
+            measures["stages"] = json.load(f)["stages"]
+    del input_layer, overlay_layer
+    app.exitQgis()
+    return measures
+
+
+def loadHistory(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def saveHistory(path, history):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def parseArguments(argv):
+    parser = argparse.ArgumentParser(description="Synthetic benchmark of the Area Weighted Average algorithm")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=["grid"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 100000], help="input features")
+    parser.add_argument("--overlap", type=float, default=4.0, help="overlay features per input feature")
+    parser.add_argument("--vertices", type=int, default=256, help="vertices of highvertex shapes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--fast-engine", action="store_true")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=0)
+    parser.add_argument("--html", action="store_true", help="also write the HTML report")
+    parser.add_argument("--label", default="", help="free text stored with the runs")
+    parser.add_argument("--workdir", default=os.path.join(cmd_folder, ".benchmark"))
+    parser.add_argument("--history", help="JSON history file, benchmark_history.json in the workdir by default")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parseArguments(argv)
+
+    # each case runs in its own process so that the peak RSS belongs to that case only
+    if args.run_case:
+        print(json.dumps(runCase(json.loads(args.run_case))))
+        return 0
+
+    os.makedirs(args.workdir, exist_ok=True)
+    if not args.history:
+        args.history = os.path.join(args.workdir, "benchmark_history.json")
+    app = initQgis()
+    commit = gitCommit()
+    history = loadHistory(args.history)
+    failures = 0
+
+    for shape in args.shapes:
+        for size in args.sizes:
+            print(f"Generating {shape} layers of {size} features ...", flush=True)
+            input_path, overlay_path = generateCase(args.workdir, shape, size, args.overlap, args.vertices, args.seed)
+
+            for repeat in range(args.repeat):
+                out_dir = os.path.join(args.workdir, f"out_{shape}_{size}")
+                os.makedirs(out_dir, exist_ok=True)
+                for name in os.listdir(out_dir):
+                    os.remove(os.path.join(out_dir, name))
+                case = {
+                    "shape": shape,
+                    "size": size,
+                    "overlap": args.overlap,
+                    "vertices": args.vertices if shape == "highvertex" else None,
+                    "seed": args.seed,
+                    "fast_engine": args.fast_engine,
+                    "workers": args.workers,
+                    "chunk_size": args.chunk_size,
+                    "html": args.html,
+                    "input": input_path,
+                    "overlay": overlay_path,
+                    "outdir": out_dir,
+                }
+                process = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case)],
+                    capture_output=True,
+                    text=True,
+                )
+                record = {
+                    "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "commit": commit,
+                    "label": args.label,
+                    "qgis": Qgis.QGIS_VERSION,
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "repeat": repeat,
+                    "case": {key: value for key, value in case.items() if key not in ("input", "overlay", "outdir")},
+                }
+                if process.returncode == 0:
+                    record.update(json.loads(process.stdout.strip().splitlines()[-1]))
+                else:
+                    failures += 1
+                    record.update({"ok": False, "error": process.stderr[-2000:]})
+                history.append(record)
+                saveHistory(args.history, history)
+
+                if record["ok"]:
+                    print(
+                        f"{shape:>10} {size:>8} features: {record['wall_time']:.2f} s, "
+                        f"peak RSS {record['peak_rss_mb'] or 0:.0f} MB",
+                        flush=True,
+                    )
+                else:
+                    print(f"{shape:>10} {size:>8} features: failed", flush=True)
+
+    app.exitQgis()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+__revision__ = "$Format:%H$"
+
+import abc
+import os
+import time
+import json
+
+from qgis.core import QgsFeatureSink, QgsWkbTypes
+from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QVariant
+
+INTEGER_TYPES = (QVariant.Int, QVariant.UInt, QVariant.LongLong, QVariant.ULongLong)
+
+
+def plainValue(value):
+    """Python value of an attribute, NULL as None and Qt dates as datetime objects"""
+    if value is None or (isinstance(value, QVariant) and value.isNull()):
+        return None
+    if isinstance(value, QDateTime):
+        return value.toPyDateTime()
+    if isinstance(value, QDate):
+        return value.toPyDate()
+    if isinstance(value, QTime):
+        return value.toPyTime()
+    return value
+
+
+class BulkWriter(abc.ABC):
+    """
+    Base of the bulk writers: buffers features and hands them over every batch_size features, and
+    keeps the count and time needed for the throughput.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffer = []
+        self.written = 0
+        self.seconds = 0.0
+
+    def addFeature(self, feature, flags=None):
+        self.buffer.append(feature)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self.buffer:
+            return
+        start = time.perf_counter()
+        self.writeBatch(self.buffer)
+        self.seconds += time.perf_counter() - start
+        self.written += len(self.buffer)
+        self.buffer = []
+
+    @abc.abstractmethod
+    def writeBatch(self, features):
+        """Write a batch of buffered features"""
+
+    def close(self):
+        self.flush()
+
+    def throughput(self, label):
+        rate = self.written / self.seconds if self.seconds else 0
+        return f"{label}: {self.written} feature(s) written in {self.seconds:.2f} s ({rate:.0f} features/s)"
+
+
+class BatchedSink(BulkWriter):
+    """Any feature sink, fed with addFeatures calls of batch_size features"""
+
+    def __init__(self, sink, batch_size):
+        super().__init__(batch_size)
+        self.sink = sink
+
+    def writeBatch(self, features):
+        self.sink.addFeatures(features, QgsFeatureSink.FastInsert)
+
+
+class GeoPackageWriter(BulkWriter):
+    """GeoPackage layer written with OGR, one transaction per batch"""
+
+    def __init__(self, path, layer_name, fields, wkb_type, crs, batch_size):
+        from osgeo import ogr, osr
+
+        super().__init__(batch_size)
+        self.ogr = ogr
+        driver = ogr.GetDriverByName("GPKG")
+        if os.path.exists(path):
+            driver.DeleteDataSource(path)
+        self.dataset = driver.CreateDataSource(path)
+        srs = osr.SpatialReference()
+        srs.ImportFromWkt(crs.toWkt())
+        self.layer = self.dataset.CreateLayer(layer_name, srs, int(wkb_type), ["SPATIAL_INDEX=YES"])
+        for field in fields:
+            field_defn = ogr.FieldDefn(field.name(), self.ogrType(field))
+            if field.type() == QVariant.Bool:
+                field_defn.SetSubType(ogr.OFSTBoolean)
+            self.layer.CreateField(field_defn)
+        self.layer_defn = self.layer.GetLayerDefn()
+
+    def ogrType(self, field):
+        # OGR only accepts the Boolean subtype on 32 bit integers
+        if field.type() == QVariant.Bool:
+            return self.ogr.OFTInteger
+        if field.type() in INTEGER_TYPES:
+            return self.ogr.OFTInteger64
+        if field.type() == QVariant.Double:
+            return self.ogr.OFTReal
+        if field.type() == QVariant.Date:
+            return self.ogr.OFTDate
+        if field.type() == QVariant.DateTime:
+            return self.ogr.OFTDateTime
+        return self.ogr.OFTString
+
+    def writeBatch(self, features):
+        self.layer.StartTransaction()
+        for feature in features:
+            ogr_feature = self.ogr.Feature(self.layer_defn)
+            if feature.hasGeometry():
+                ogr_feature.SetGeometryDirectly(self.ogr.CreateGeometryFromWkb(bytes(feature.geometry().asWkb())))
+            for i, value in enumerate(feature.attributes()):
+                value = plainValue(value)
+                if value is None:
+                    ogr_feature.SetFieldNull(i)
+                elif isinstance(value, bool):
+                    ogr_feature.SetField(i, int(value))
+                elif hasattr(value, "isoformat"):
+                    ogr_feature.SetField(i, value.isoformat())
+                else:
+                    ogr_feature.SetField(i, value)
+            self.layer.CreateFeature(ogr_feature)
+        self.layer.CommitTransaction()
+
+    def close(self):
+        super().close()
+        self.layer = None
+        self.dataset = None
+
+
+class GeoParquetWriter(BulkWriter):
+    """
+    GeoParquet file written with pyarrow, one row group per batch. Geometries are stored as WKB and
+    the columns of dictionary_fields are dictionary encoded. Without geometry, a plain Parquet file
+    is written, with neither geometry column nor geo metadata.
+    """
+
+    def __init__(self, path, fields, wkb_type, crs, batch_size, dictionary_fields=()):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from osgeo import osr
+
+        super().__init__(batch_size)
+        self.pa = pa
+        self.names = fields.names()
+        self.types = [self.arrowType(field) for field in fields]
+        self.dictionary = [
+            name in dictionary_fields and pa.types.is_string(t) for name, t in zip(self.names, self.types)
+        ]
+        columns = [
+            pa.field(name, pa.dictionary(pa.int32(), t) if encoded else t)
+            for name, t, encoded in zip(self.names, self.types, self.dictionary)
+        ]
+        self.has_geometry = QgsWkbTypes.flatType(wkb_type) != QgsWkbTypes.NoGeometry
+        metadata = None
+        if self.has_geometry:
+            columns.append(pa.field("geometry", pa.binary()))
+            srs = osr.SpatialReference()
+            srs.ImportFromWkt(crs.toWkt())
+            geo = {
+                "version": "1.0.0",
+                "primary_column": "geometry",
+                "columns": {
+                    "geometry": {
+                        "encoding": "WKB",
+                        "geometry_types": [QgsWkbTypes.displayString(QgsWkbTypes.flatType(wkb_type))],
+                        "crs": json.loads(srs.ExportToPROJJSON()),
+                    }
+                },
+            }
+            metadata = {"geo": json.dumps(geo)}
+        self.schema = pa.schema(columns, metadata=metadata)
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def arrowType(self, field):
+        pa = self.pa
+        if field.type() in INTEGER_TYPES:
+            return pa.int64()
+        if field.type() == QVariant.Double:
+            return pa.float64()
+        if field.type() == QVariant.Bool:
+            return pa.bool_()
+        if field.type() == QVariant.Date:
+            return pa.date32()
+        if field.type() == QVariant.DateTime:
+            return pa.timestamp("ms")
+        return pa.string()
+
+    def writeBatch(self, features):
+        pa = self.pa
+        rows = [[plainValue(value) for value in feature.attributes()] for feature in features]
+        arrays = []
+        for i, (t, encoded) in enumerate(zip(self.types, self.dictionary)):
+            values = [row[i] for row in rows]
+            if t == pa.string():
+                values = [None if value is None else str(value) for value in values]
+            array = pa.array(values, type=t)
+            arrays.append(array.dictionary_encode() if encoded else array)
+        if self.has_geometry:
+            arrays.append(
+                pa.array(
+                    [bytes(feature.geometry().asWkb()) if feature.hasGeometry() else None for feature in features],
+                    type=pa.binary(),
+                )
+            )
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema), row_group_size=self.batch_size)
+
+    def close(self):
+        super().close()
+        self.writer.close()
+
+
+def bulkWriter(path, layer_name, fields, wkb_type, crs, batch_size, dictionary_fields=()):
+    """Bulk writer for a GeoPackage or GeoParquet file path, None for any other destination"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".gpkg":
+        return GeoPackageWriter(path, layer_name, fields, wkb_type, crs, batch_size)
+    if extension == ".parquet":
+        return GeoParquetWriter(path, fields, wkb_type, crs, batch_size, dictionary_fields)
+    return None
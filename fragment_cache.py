@@ -0,0 +1,125 @@
+"""
+On-disk cache of the pieces produced by clipping an input layer against an overlay layer. Entries are
+keyed on a fingerprint of the geometries, feature ids and CRS of both layers and of the way areas are
+measured, so reruns of the same pair with other fields to average or additional fields can skip the
+geometric overlay entirely.
+"""
+
+import hashlib
+import itertools
+import os
+import sqlite3
+import struct
+import tempfile
+
+from qgis.core import QgsFeatureRequest
+
+
+def layersFingerprint(input_layer, overlay_layer, measure_key, feedback=None):
+    """
+    Hash the key of the area measure, as the cached pieces keep their areas, and the CRS, feature ids
+    and geometries of both layers. Attributes are not part of the key
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(measure_key.encode("utf-8"))
+    for layer in (input_layer, overlay_layer):
+        digest.update(layer.crs().toWkt().encode("utf-8"))
+        for feat in layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
+            if feedback is not None and feedback.isCanceled():
+                return None
+            digest.update(struct.pack("<q", feat.id()))
+            if feat.hasGeometry():
+                digest.update(bytes(feat.geometry().asWkb()))
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+class FragmentCacheWriter:
+    """Collects the pieces of one run and publishes them as a cache entry once the run completes"""
+
+    BATCH_SIZE = 10000
+
+    def __init__(self, cache, fingerprint):
+        self.cache = cache
+        self.path = cache.entryPath(fingerprint)
+        # a file of its own per writer, concurrent runs of the same pair do not clobber each other
+        handle, self.part_path = tempfile.mkstemp(suffix=".part", prefix=fingerprint, dir=cache.folder)
+        os.close(handle)
+        self.connection = sqlite3.connect(self.part_path)
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute(
+            "CREATE TABLE fragments (input_feat_id INTEGER, overlay_fid INTEGER, area REAL, wkb BLOB)"
+        )
+        self.rows = []
+
+    def add(self, input_feat_id, pieces):
+        """pieces is a list of (overlay fid, area, wkb)"""
+        self.rows.extend((input_feat_id, overlay_fid, area, wkb) for overlay_fid, area, wkb in pieces)
+        if len(self.rows) >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.connection.executemany("INSERT INTO fragments VALUES (?, ?, ?, ?)", self.rows)
+        self.rows = []
+
+    def commit(self):
+        self.flush()
+        self.connection.commit()
+        self.connection.close()
+        os.replace(self.part_path, self.path)
+        self.cache.evict(keep=self.path)
+
+    def discard(self):
+        self.connection.close()
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+class FragmentCache:
+    """
+    Folder of SQLite files, one per input/overlay fingerprint. The folder is kept under max_size_mb by
+    removing the least recently used entries; reading an entry refreshes its modification time.
+    """
+
+    EXTENSION = ".awacache"
+
+    def __init__(self, folder, max_size_mb):
+        self.folder = folder
+        self.max_size = max_size_mb * 1024 * 1024
+        os.makedirs(folder, exist_ok=True)
+
+    def entryPath(self, fingerprint):
+        return os.path.join(self.folder, fingerprint + self.EXTENSION)
+
+    def contains(self, fingerprint):
+        return os.path.isfile(self.entryPath(fingerprint))
+
+    def read(self, fingerprint):
+        """Yield (input_feat_id, [(overlay fid, area, wkb)]) in input_feat_id order"""
+        path = self.entryPath(fingerprint)
+        os.utime(path)
+        connection = sqlite3.connect(path)
+        try:
+            rows = connection.execute("SELECT input_feat_id, overlay_fid, area, wkb FROM fragments ORDER BY rowid")
+            for input_feat_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+                yield input_feat_id, [(overlay_fid, area, wkb) for _, overlay_fid, area, wkb in group]
+        finally:
+            connection.close()
+
+    def writer(self, fingerprint):
+        return FragmentCacheWriter(self, fingerprint)
+
+    def evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith(self.EXTENSION):
+                path = os.path.join(self.folder, name)
+                entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+
+        used = 0
+        for mtime, size, path in sorted(entries, reverse=True):
+            if path != keep and used + size > self.max_size:
+                os.remove(path)
+                continue
+            used += size
@@ -0,0 +1,145 @@
+"""
+Geometry kernels of the fast engine. This module only depends on qgis.core so that it can be
+imported cheaply by the worker processes of the parallel mode.
+"""
+
+import collections
+
+from qgis.core import (
+    QgsFeature,
+    QgsGeometry,
+    QgsSpatialIndex,
+    QgsWkbTypes,
+)
+
+
+def polygonalPart(geometry):
+    """Return the polygon part of an intersection as a multipolygon, or None if nothing areal is left"""
+    if geometry is None or geometry.isEmpty():
+        return None
+    if geometry.type() != QgsWkbTypes.PolygonGeometry:
+        if QgsWkbTypes.flatType(geometry.wkbType()) != QgsWkbTypes.GeometryCollection:
+            return None
+        parts = [part for part in geometry.asGeometryCollection() if part.type() == QgsWkbTypes.PolygonGeometry]
+        if not parts:
+            return None
+        geometry = QgsGeometry.collectGeometry(parts)
+    geometry.convertToMultiType()
+    return geometry
+
+
+def geometryFromWkb(wkb):
+    geometry = QgsGeometry()
+    geometry.fromWkb(wkb)
+    return geometry
+
+
+def clipPieces(input_geom, overlay_index, stats=None):
+    """
+    Clip one input geometry against the overlay candidates of an index built with stored geometries.
+    Returns (overlay fid, piece) pairs. Candidates are visited in fid order so the result does not
+    depend on the index content beyond the candidates themselves. An input geometry within a
+    candidate is its own piece, without intersection, and the candidates whose interior does not
+    meet its interior are then skipped; if stats is given, input geometries that needed no
+    intersection at all are counted in stats["contained"].
+    """
+    engine = QgsGeometry.createGeometryEngine(input_geom.constGet())
+    engine.prepareGeometry()
+
+    candidates = []
+    for overlay_fid in sorted(overlay_index.intersects(input_geom.boundingBox())):
+        overlay_geom = overlay_index.geometry(overlay_fid)
+        if engine.intersects(overlay_geom.constGet()):
+            candidates.append((overlay_fid, overlay_geom, engine.within(overlay_geom.constGet())))
+    # next to a candidate the input geometry is within, the neighbours that only touch it add nothing
+    any_within = any(within for overlay_fid, overlay_geom, within in candidates)
+
+    pieces = []
+    clipped = False
+    for overlay_fid, overlay_geom, within in candidates:
+        if within:
+            piece = polygonalPart(QgsGeometry(input_geom))
+        elif any_within and not engine.relatePattern(overlay_geom.constGet(), "T********"):
+            continue
+        else:
+            clipped = True
+            piece = polygonalPart(input_geom.intersection(overlay_geom))
+        if piece is not None:
+            pieces.append((overlay_fid, piece))
+    if stats is not None and pieces and not clipped:
+        stats["contained"] += 1
+    return pieces
+
+
+def groupPieces(pieces, overlay_keys):
+    """
+    Group the measured (overlay fid, piece, area) pieces of one input feature by overlay key, so the
+    report has one row per key without dissolving the overlay. Pieces sharing a key are collected
+    into one multipolygon, not unioned, and their areas are summed. Returns (key, fragment, area)
+    triples in order of first appearance.
+    """
+    grouped = {}
+    for overlay_fid, piece, area in pieces:
+        group = grouped.setdefault(overlay_keys[overlay_fid], [[], 0.0])
+        group[0].append(piece)
+        group[1] += area
+
+    fragments = []
+    for key, (parts, area) in grouped.items():
+        fragment = QgsGeometry.collectGeometry(parts) if len(parts) > 1 else parts[0]
+        fragment.convertToMultiType()
+        fragments.append((key, fragment, area))
+    return fragments
+
+
+def groupAreas(pieces, overlay_keys):
+    """
+    Same grouping as groupPieces for a report without geometry: only the areas are summed. Returns
+    (key, None, area) triples in order of first appearance.
+    """
+    grouped = {}
+    for overlay_fid, piece, area in pieces:
+        key = overlay_keys[overlay_fid]
+        grouped[key] = grouped.get(key, 0.0) + area
+    return [(key, None, area) for key, area in grouped.items()]
+
+
+def removeSlivers(pieces, input_area, min_area, min_percent, fold=False):
+    """
+    Remove the measured (overlay fid, piece, area) pieces of one input feature smaller than min_area
+    or than min_percent of input_area. With fold, their area is added to the largest remaining piece
+    so the weights still sum to the covered area. Returns the kept pieces, the number of removed
+    pieces and their area.
+    """
+    threshold = max(min_area, input_area * min_percent / 100 if input_area else 0)
+    kept = [piece for piece in pieces if piece[2] >= threshold]
+    if len(kept) == len(pieces):
+        return pieces, 0, 0.0
+    removed_area = sum(area for overlay_fid, piece, area in pieces) - sum(area for overlay_fid, piece, area in kept)
+    if fold and kept:
+        largest = max(range(len(kept)), key=lambda i: kept[i][2])
+        overlay_fid, piece, area = kept[largest]
+        kept[largest] = (overlay_fid, piece, area + removed_area)
+    return kept, len(pieces) - len(kept), removed_area
+
+
+def clipPartition(task):
+    """
+    Worker entry point of the parallel mode. The task holds a partition number, the (input_feat_id, wkb)
+    pairs of the partition and the (fid, wkb) pairs of the overlay features it can reach. Pieces are
+    returned as WKB so they can be sent back to the parent process, with the clipping stats.
+    """
+    partition, input_features, overlay_features = task
+
+    overlay_index = QgsSpatialIndex(QgsSpatialIndex.FlagStoreFeatureGeometries)
+    for overlay_fid, wkb in overlay_features:
+        overlay_feat = QgsFeature(overlay_fid)
+        overlay_feat.setGeometry(geometryFromWkb(wkb))
+        overlay_index.addFeature(overlay_feat)
+
+    clipped = []
+    stats = collections.Counter()
+    for input_feat_id, wkb in input_features:
+        pieces = clipPieces(geometryFromWkb(wkb), overlay_index, stats)
+        clipped.append((input_feat_id, [(overlay_fid, bytes(piece.asWkb())) for overlay_fid, piece in pieces]))
+    return partition, clipped, stats
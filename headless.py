@@ -0,0 +1,40 @@
+__revision__ = "$Format:%H$"
+
+import os
+import sys
+
+from qgis.core import QgsApplication, QgsProcessingException
+
+cmd_folder = os.path.dirname(os.path.abspath(__file__))
+
+
+def initQgis():
+    """Start a QGIS application without GUI and register the native processing algorithms"""
+    app = QgsApplication([], False)
+    app.initQgis()
+
+    from processing.core.Processing import Processing
+    from qgis.analysis import QgsNativeAlgorithms
+
+    Processing.initialize()
+    QgsApplication.processingRegistry().addProvider(QgsNativeAlgorithms())
+    return app
+
+
+def importAlgorithm():
+    """Import AreaWeightedAverageAlgorithm from this folder, the plugin package must be importable"""
+    if cmd_folder not in sys.path:
+        sys.path.insert(0, cmd_folder)
+    from QGIS_plugin_mod import AreaWeightedAverageAlgorithm
+
+    return AreaWeightedAverageAlgorithm
+
+
+def runAlgorithm(algorithm, parameters, context, feedback):
+    """
+    Prepare and run an algorithm, returning its results. Unlike QgsProcessingAlgorithm.run,
+    postProcessAlgorithm is skipped: it counts usage and may open a dialog.
+    """
+    if not algorithm.prepare(parameters, context, feedback):
+        raise QgsProcessingException("Algorithm could not be prepared")
+    return algorithm.runPrepared(parameters, context, feedback)
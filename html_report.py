@@ -0,0 +1,115 @@
+__revision__ = "$Format:%H$"
+
+import os
+import re
+import html
+import codecs
+
+HTML_HEAD = '<html><head>\n<meta http-equiv="Content-Type" content="text/html; charset=utf-8" /></head><body>\n'
+HTML_TAIL = "</body></html>\n"
+PAGE_NAME = re.compile(r"page_\d{5,}\.html")
+
+
+def cellText(value):
+    if value is None:
+        return "Null"
+    if isinstance(value, float):
+        return f"{value:.5f}"
+    return html.escape(str(value))
+
+
+class HtmlReport:
+    """Report as HTML in a single file, sections are appended as they are written"""
+
+    def __init__(self, path):
+        self.f = codecs.open(path, "w", encoding="utf-8")
+        self.f.write(HTML_HEAD)
+
+    def addSection(self, feature_id, title, weighted_values, section):
+        self.f.write(section)
+
+    def close(self):
+        self.f.write(HTML_TAIL)
+        self.f.close()
+
+
+class PagedHtmlReport:
+    """
+    Report as HTML split in pages of page_size input features, written to a folder next to the
+    index page. The index page has one row per input feature with its weighted values and a link
+    to its section. Only the current page and the index are open, nothing is kept in memory. Pages
+    left in the folder by an earlier report are removed.
+    """
+
+    def __init__(self, path, page_size, weighted_fields):
+        self.page_size = page_size
+        self.index_name = os.path.basename(path)
+        self.folder_name = os.path.splitext(self.index_name)[0] + "_pages"
+        self.folder = os.path.join(os.path.dirname(path), self.folder_name)
+        os.makedirs(self.folder, exist_ok=True)
+        # pages of an earlier, larger report would still be reachable from the folder
+        for name in os.listdir(self.folder):
+            if PAGE_NAME.fullmatch(name):
+                os.remove(os.path.join(self.folder, name))
+        self.page = None
+        self.page_number = 0
+        self.page_features = 0
+
+        self.index = codecs.open(path, "w", encoding="utf-8")
+        self.index.write(HTML_HEAD)
+        self.index.write('<table border="1" class="dataframe">\n<thead><tr style="text-align: left;">')
+        for title in ["Feature"] + list(weighted_fields) + ["Page"]:
+            self.index.write(f"<th>{html.escape(title)}</th>")
+        self.index.write("</tr></thead>\n<tbody>\n")
+
+    def pageName(self, number):
+        return f"page_{number:05d}.html"
+
+    def openPage(self):
+        self.page_number += 1
+        self.page_features = 0
+        self.page = codecs.open(os.path.join(self.folder, self.pageName(self.page_number)), "w", encoding="utf-8")
+        self.page.write(HTML_HEAD)
+        self.page.write(self.navigation(previous=self.page_number > 1, following=False))
+
+    def closePage(self, following):
+        self.page.write(self.navigation(previous=self.page_number > 1, following=following))
+        self.page.write(HTML_TAIL)
+        self.page.close()
+        self.page = None
+
+    def navigation(self, previous, following):
+        links = [f'<a href="../{html.escape(self.index_name)}">Index</a>']
+        if previous:
+            links.append(f'<a href="{self.pageName(self.page_number - 1)}">Previous</a>')
+        if following:
+            links.append(f'<a href="{self.pageName(self.page_number + 1)}">Next</a>')
+        return f"<p>Page {self.page_number}: {' | '.join(links)}</p>\n"
+
+    def addSection(self, feature_id, title, weighted_values, section):
+        if self.page is not None and self.page_features >= self.page_size:
+            self.closePage(following=True)
+        if self.page is None:
+            self.openPage()
+        self.page_features += 1
+        self.page.write(f'<div id="f{feature_id}">\n{section}</div>\n')
+
+        link = f"{self.folder_name}/{self.pageName(self.page_number)}#f{feature_id}"
+        cells = [f'<a href="{html.escape(link)}">{html.escape(str(title))}</a>']
+        cells += [cellText(value) for value in weighted_values]
+        cells.append(str(self.page_number))
+        self.index.write("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>\n")
+
+    def close(self):
+        if self.page is not None:
+            self.closePage(following=False)
+        self.index.write("</tbody>\n</table>\n")
+        self.index.write(HTML_TAIL)
+        self.index.close()
+
+
+def htmlReport(path, page_size=0, weighted_fields=()):
+    """Paged report with an index page at path if page_size is above 0, a single file otherwise"""
+    if page_size > 0:
+        return PagedHtmlReport(path, page_size, weighted_fields)
+    return HtmlReport(path)
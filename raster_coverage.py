@@ -0,0 +1,131 @@
+__revision__ = "$Format:%H$"
+
+import math
+
+import numpy as np
+
+from qgis.core import Qgis, QgsGeometry, QgsPointXY, QgsRectangle, QgsWkbTypes
+
+from area_weighted_average.processing.area_measure import polygonRings
+
+# numpy types of raster block data types
+BLOCK_DTYPES = {
+    Qgis.Byte: np.uint8,
+    Qgis.UInt16: np.uint16,
+    Qgis.Int16: np.int16,
+    Qgis.UInt32: np.uint32,
+    Qgis.Int32: np.int32,
+    Qgis.Float32: np.float32,
+    Qgis.Float64: np.float64,
+}
+
+
+def alignedWindow(bbox, raster_extent, x_res, y_res):
+    """
+    Smallest extent snapped on the raster grid that covers bbox, clipped to the raster extent.
+    Returns None if bbox is outside of the raster.
+    """
+    bbox = bbox.intersect(raster_extent)
+    if bbox.isEmpty():
+        return None
+    x0 = raster_extent.xMinimum()
+    y1 = raster_extent.yMaximum()
+    col0 = math.floor((bbox.xMinimum() - x0) / x_res)
+    col1 = max(col0 + 1, math.ceil((bbox.xMaximum() - x0) / x_res))
+    row0 = math.floor((y1 - bbox.yMaximum()) / y_res)
+    row1 = max(row0 + 1, math.ceil((y1 - bbox.yMinimum()) / y_res))
+    return QgsRectangle(x0 + col0 * x_res, y1 - row1 * y_res, x0 + col1 * x_res, y1 - row0 * y_res)
+
+
+def windowShape(window, x_res, y_res):
+    return round(window.height() / y_res), round(window.width() / x_res)
+
+
+def readWindow(provider, band, window, x_res, y_res):
+    """Cells of a band within an aligned window as float64, NaN where there is no data"""
+    rows, cols = windowShape(window, x_res, y_res)
+    block = provider.block(band, window, cols, rows)
+    if not block.isValid() or block.isEmpty() or block.dataType() not in BLOCK_DTYPES:
+        return np.full((rows, cols), np.nan)
+    values = np.frombuffer(bytes(block.data()), dtype=BLOCK_DTYPES[block.dataType()])
+    values = values.astype(np.float64).reshape(rows, cols)
+    if block.hasNoDataValue():
+        values[values == block.noDataValue()] = np.nan
+    return values
+
+
+def boundaryEdges(geometry):
+    """Edges of the rings of a polygon geometry as x1, y1, x2, y2 arrays, curves are segmentized"""
+    if QgsWkbTypes.isCurvedType(geometry.wkbType()):
+        geometry = QgsGeometry(geometry.constGet().segmentize())
+    edges = [
+        (x[:-1], y[:-1], x[1:], y[1:]) for exterior, x, y in polygonRings(bytes(geometry.asWkb())) if len(x) > 1
+    ]
+    if not edges:
+        return None
+    return tuple(np.concatenate(coords) for coords in zip(*edges))
+
+
+def crossedColumns(edges, bottom, top, x0, x_res, cols):
+    """Columns of a row strip between bottom and top that the edges go through or touch"""
+    x1, y1, x2, y2 = edges
+    y_low = np.maximum(np.minimum(y1, y2), bottom)
+    y_high = np.minimum(np.maximum(y1, y2), top)
+    in_strip = y_low <= y_high
+    x1, y1, x2, y2 = x1[in_strip], y1[in_strip], x2[in_strip], y2[in_strip]
+    y_low, y_high = y_low[in_strip], y_high[in_strip]
+    # x of every edge where it enters and leaves the strip, horizontal edges keep their ends
+    dy = y2 - y1
+    slope = np.divide(x2 - x1, dy, out=np.zeros_like(dy), where=dy != 0)
+    flat = dy == 0
+    xa = np.where(flat, x1, x1 + (y_low - y1) * slope)
+    xb = np.where(flat, x2, x1 + (y_high - y1) * slope)
+    col0 = np.clip(np.floor((np.minimum(xa, xb) - x0) / x_res).astype(np.int64), 0, cols - 1)
+    col1 = np.clip(np.floor((np.maximum(xa, xb) - x0) / x_res).astype(np.int64), 0, cols - 1)
+    marks = np.zeros(cols + 1, dtype=np.int64)
+    np.add.at(marks, col0, 1)
+    np.add.at(marks, col1 + 1, -1)
+    return np.cumsum(marks[:-1]) > 0
+
+
+def coverageFractions(geometry, window, x_res, y_res):
+    """
+    Fraction of every cell of an aligned window covered by geometry. Only the cells crossed by the
+    rings of the geometry are intersected, with the part of the geometry in their row; the runs of
+    cells between them are wholly inside or outside and are filled at once after testing one point.
+    """
+    rows, cols = windowShape(window, x_res, y_res)
+    fractions = np.zeros((rows, cols))
+    edges = boundaryEdges(geometry)
+    if edges is None:
+        return fractions
+    engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+    engine.prepareGeometry()
+    cell_area = x_res * y_res
+    x0 = window.xMinimum()
+    y1 = window.yMaximum()
+
+    for row in range(rows):
+        top = y1 - row * y_res
+        crossed = crossedColumns(edges, top - y_res, top, x0, x_res, cols)
+
+        # runs of cells not crossed by any ring, as [start, end) column pairs
+        changes = np.flatnonzero(np.diff(np.concatenate(([True], crossed, [True])).astype(np.int8)))
+        for start, end in zip(changes[::2].tolist(), changes[1::2].tolist()):
+            center = QgsGeometry.fromPointXY(QgsPointXY(x0 + (start + 0.5) * x_res, top - y_res / 2))
+            if engine.contains(center.constGet()):
+                fractions[row, start:end] = 1.0
+
+        if not crossed.any():
+            continue
+        strip = QgsGeometry.fromRect(QgsRectangle(x0, top - y_res, x0 + cols * x_res, top))
+        strip_piece = engine.intersection(strip.constGet())
+        if strip_piece is None or strip_piece.isEmpty():
+            continue
+        strip_engine = QgsGeometry.createGeometryEngine(strip_piece)
+        for col in np.flatnonzero(crossed).tolist():
+            cell = QgsGeometry.fromRect(QgsRectangle(x0 + col * x_res, top - y_res, x0 + (col + 1) * x_res, top))
+            piece = strip_engine.intersection(cell.constGet())
+            if piece is not None:
+                fractions[row, col] = min(1.0, piece.area() / cell_area)
+    return fractions
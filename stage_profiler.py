@@ -0,0 +1,175 @@
+__revision__ = "$Format:%H$"
+
+import sys
+import json
+import time
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import processing
+
+from qgis.core import QgsFeatureRequest, QgsProcessingUtils, QgsVectorLayer
+
+
+def readProcStatus():
+    """VmRSS and VmHWM of this process in MB from /proc, or None where /proc is not available"""
+    try:
+        with open("/proc/self/status") as f:
+            values = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(values["VmRSS"].split()[0]) / 1024, int(values["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def resetPeakMemory():
+    """
+    Reset the peak resident set size of this process so the next reading covers a single stage.
+    Only possible on Linux, elsewhere the peak of the whole process is reported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peakMemory():
+    """Peak resident set size in MB since the last reset, None if it cannot be measured"""
+    status = readProcStatus()
+    if status is not None:
+        return round(status[1], 1)
+    if resource is not None:
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return round(rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024, 1)
+    return None
+
+
+class Stage:
+    """
+    Measures of one named stage. Inputs and outputs are given as layers, layer ids or paths and are
+    only counted once the stage timer has stopped.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = None
+        self.peak_memory_mb = None
+        self.features_in = None
+        self.features_out = None
+        self.vertices_in = None
+        self.vertices_out = None
+        self.input = None
+        self.output = None
+
+    def setInput(self, layer):
+        self.input = layer
+
+    def setOutput(self, layer):
+        self.output = layer
+
+    def setCounts(self, features_in=None, features_out=None, vertices_in=None, vertices_out=None):
+        self.features_in = features_in
+        self.features_out = features_out
+        self.vertices_in = vertices_in
+        self.vertices_out = vertices_out
+
+    def asDict(self):
+        return {
+            "stage": self.name,
+            "seconds": self.seconds,
+            "peak_memory_mb": self.peak_memory_mb,
+            "features_in": self.features_in,
+            "features_out": self.features_out,
+            "vertices_in": self.vertices_in,
+            "vertices_out": self.vertices_out,
+        }
+
+
+class StageProfiler:
+    """
+    Records wall time, feature counts, vertex counts and peak memory of the named stages of a run.
+    Counting vertices needs an extra pass over the geometries, so it is only done when asked for.
+    """
+
+    def __init__(self, context, count_vertices=False):
+        self.context = context
+        self.count_vertices = count_vertices
+        self.stages = []
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, input_layer=None):
+        stage = Stage(name)
+        stage.setInput(input_layer)
+        resetPeakMemory()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = round(time.perf_counter() - start, 4)
+            stage.peak_memory_mb = peakMemory()
+            self.measure(stage)
+            self.stages.append(stage)
+
+    def run(self, name, algorithm_id, alg_params, context, feedback):
+        """processing.run of a child algorithm as a stage, measuring its INPUT and OUTPUT layers"""
+        with self.stage(name, alg_params.get("INPUT")) as stage:
+            outputs = processing.run(
+                algorithm_id,
+                alg_params,
+                context=context,
+                feedback=feedback,
+                is_child_algorithm=True,
+            )
+            stage.setOutput(outputs.get("OUTPUT"))
+        return outputs
+
+    def measure(self, stage):
+        if stage.input is not None and stage.features_in is None:
+            stage.features_in, stage.vertices_in = self.layerCounts(stage.input)
+        if stage.output is not None and stage.features_out is None:
+            stage.features_out, stage.vertices_out = self.layerCounts(stage.output)
+
+    def layerCounts(self, layer):
+        """Feature count and, if enabled, vertex count of a layer, a layer id or a path"""
+        if not isinstance(layer, QgsVectorLayer):
+            if not isinstance(layer, str):
+                return None, None
+            layer = QgsProcessingUtils.mapLayerFromString(layer, self.context)
+            if not isinstance(layer, QgsVectorLayer):
+                return None, None
+        features = layer.featureCount()
+        if not self.count_vertices:
+            return features, None
+        vertices = 0
+        for feat in layer.getFeatures(QgsFeatureRequest().setNoAttributes()):
+            if feat.hasGeometry():
+                vertices += feat.geometry().constGet().nCoordinates()
+        return features, vertices
+
+    def summary(self):
+        """Lines of a fixed width table of the stages"""
+        total = round(time.perf_counter() - self.start, 4)
+        header = ["Seconds", "Peak MB", "Feat in", "Feat out", "Vert in", "Vert out"]
+        widths = [10, 10, 11, 11, 13, 13]
+        lines = ["Stage".ljust(28) + "".join(title.rjust(width) for title, width in zip(header, widths))]
+        for stage in self.stages:
+            values = [stage.seconds, stage.peak_memory_mb, stage.features_in, stage.features_out]
+            values += [stage.vertices_in, stage.vertices_out]
+            cells = ["" if value is None else str(value) for value in values]
+            lines.append(stage.name[:27].ljust(28) + "".join(cell.rjust(width) for cell, width in zip(cells, widths)))
+        lines.append(f"{'Total':<28}{total:>10}")
+        return lines
+
+    def save(self, path):
+        profile = {
+            "total_seconds": round(time.perf_counter() - self.start, 4),
+            "stages": [stage.asDict() for stage in self.stages],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(profile, f, indent=1)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules without QGIS imports are tested straight from the plugin folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,32 @@
+import pytest
+
+ogr = pytest.importorskip("osgeo.ogr")
+core = pytest.importorskip("qgis.core")
+from qgis.PyQt.QtCore import QVariant  # noqa: E402
+
+from bulk_writer import GeoPackageWriter  # noqa: E402
+
+
+def test_geopackage_bool_field_keeps_boolean_subtype(tmp_path):
+    path = str(tmp_path / "bool.gpkg")
+    fields = core.QgsFields()
+    fields.append(core.QgsField("flag", QVariant.Bool))
+    fields.append(core.QgsField("count", QVariant.LongLong))
+    writer = GeoPackageWriter(
+        path, "bool", fields, core.QgsWkbTypes.Point, core.QgsCoordinateReferenceSystem("EPSG:4326"), 10
+    )
+    for flag, count in ((True, 1), (False, 2), (None, 3)):
+        feature = core.QgsFeature(fields)
+        feature.setGeometry(core.QgsGeometry.fromPointXY(core.QgsPointXY(count, count)))
+        feature.setAttributes([flag, count])
+        writer.addFeature(feature)
+    writer.close()
+
+    dataset = ogr.Open(path)
+    layer = dataset.GetLayer("bool")
+    flag_defn = layer.GetLayerDefn().GetFieldDefn(0)
+    assert flag_defn.GetType() == ogr.OFTInteger
+    assert flag_defn.GetSubType() == ogr.OFSTBoolean
+    assert layer.GetLayerDefn().GetFieldDefn(1).GetType() == ogr.OFTInteger64
+    values = [feature.GetField("flag") for feature in layer]
+    assert values == [1, 0, None]
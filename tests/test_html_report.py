@@ -0,0 +1,82 @@
+import os
+
+from html_report import HtmlReport, PagedHtmlReport, cellText, htmlReport
+
+
+def readText(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def writePagedReport(folder, features, page_size=2):
+    path = os.path.join(folder, "report.html")
+    report = htmlReport(path, page_size, ["weighted_a"])
+    for feature_id in range(1, features + 1):
+        report.addSection(feature_id, f"parcel {feature_id}", [feature_id / 2], f"<p>section {feature_id}</p>\n")
+    report.close()
+    return path, os.path.join(folder, "report_pages")
+
+
+def test_cell_text():
+    assert cellText(None) == "Null"
+    assert cellText(0.5) == "0.50000"
+    assert cellText("<a>") == "&lt;a&gt;"
+
+
+def test_single_file_without_page_size(tmp_path):
+    report = htmlReport(str(tmp_path / "report.html"))
+    assert isinstance(report, HtmlReport)
+    report.addSection(1, "parcel 1", [1.0], "<p>section 1</p>\n")
+    report.close()
+    assert "<p>section 1</p>" in readText(tmp_path / "report.html")
+
+
+def test_pages_roll_over(tmp_path):
+    path, folder = writePagedReport(str(tmp_path), 5)
+    assert sorted(os.listdir(folder)) == ["page_00001.html", "page_00002.html", "page_00003.html"]
+    first = readText(os.path.join(folder, "page_00001.html"))
+    assert '<div id="f1">' in first and '<div id="f2">' in first and '<div id="f3">' not in first
+    last = readText(os.path.join(folder, "page_00003.html"))
+    assert '<div id="f5">' in last
+
+
+def test_page_navigation_links(tmp_path):
+    path, folder = writePagedReport(str(tmp_path), 5)
+    first = readText(os.path.join(folder, "page_00001.html"))
+    assert '<a href="../report.html">Index</a>' in first
+    assert '<a href="page_00002.html">Next</a>' in first
+    assert "Previous" not in first
+    middle = readText(os.path.join(folder, "page_00002.html"))
+    assert '<a href="page_00001.html">Previous</a>' in middle
+    assert '<a href="page_00003.html">Next</a>' in middle
+    last = readText(os.path.join(folder, "page_00003.html"))
+    assert '<a href="page_00002.html">Previous</a>' in last
+    assert "Next" not in last
+
+
+def test_index_links_every_feature(tmp_path):
+    path, folder = writePagedReport(str(tmp_path), 3)
+    index = readText(path)
+    assert '<a href="report_pages/page_00001.html#f1">parcel 1</a>' in index
+    assert '<a href="report_pages/page_00002.html#f3">parcel 3</a>' in index
+    assert "<td>1.50000</td><td>2</td>" in index
+    assert index.count("<tr>") == 3
+
+
+def test_exact_page_size_has_no_empty_page(tmp_path):
+    path, folder = writePagedReport(str(tmp_path), 4)
+    assert sorted(os.listdir(folder)) == ["page_00001.html", "page_00002.html"]
+    assert "Next" not in readText(os.path.join(folder, "page_00002.html"))
+
+
+def test_positive_page_size_is_paged(tmp_path):
+    report = htmlReport(str(tmp_path / "report.html"), 1)
+    report.close()
+    assert isinstance(report, PagedHtmlReport)
+    assert os.path.isdir(tmp_path / "report_pages")
+
+
+def test_stale_pages_are_removed(tmp_path):
+    writePagedReport(str(tmp_path), 7)
+    path, folder = writePagedReport(str(tmp_path), 3)
+    assert sorted(os.listdir(folder)) == ["page_00001.html", "page_00002.html"]
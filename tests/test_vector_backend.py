@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+shapely = pytest.importorskip("shapely")
+
+from vector_backend import VectorOverlay, weightedSums  # noqa: E402
+
+
+def box(x0, y0, x1, y1):
+    return shapely.to_wkb(shapely.box(x0, y0, x1, y1))
+
+
+@pytest.fixture
+def overlay():
+    # two unit squares side by side, the fids are not in position order
+    return VectorOverlay([20, 10], [box(0, 0, 1, 1), box(1, 0, 2, 1)])
+
+
+def test_contained_feature_is_its_own_piece(overlay):
+    inside = box(0.2, 0.2, 0.8, 0.8)
+    input_positions, overlay_positions, wkbs, areas, contained = overlay.intersect([inside])
+    assert input_positions.tolist() == [0]
+    assert overlay_positions.tolist() == [0]
+    assert shapely.equals(shapely.from_wkb(wkbs[0]), shapely.from_wkb(inside))
+    assert areas.tolist() == pytest.approx([0.36])
+    assert contained == 1
+
+
+def test_touching_neighbour_is_skipped(overlay):
+    # within the first square and touching the second one along x = 1
+    input_positions, overlay_positions, wkbs, areas, contained = overlay.intersect([box(0.5, 0, 1, 1)])
+    assert overlay_positions.tolist() == [0]
+    assert contained == 1
+
+
+def test_touching_only_gives_no_piece(overlay):
+    input_positions, overlay_positions, wkbs, areas, contained = overlay.intersect([box(2, 0, 3, 1), None])
+    assert len(input_positions) == 0
+    assert contained == 0
+
+
+def test_pieces_sorted_by_input_and_overlay_fid(overlay):
+    across = box(0.5, 0, 1.5, 1)
+    input_positions, overlay_positions, wkbs, areas, contained = overlay.intersect([across, across])
+    assert input_positions.tolist() == [0, 0, 1, 1]
+    assert overlay.overlay_fids[overlay_positions].tolist() == [10, 20, 10, 20]
+    assert areas.tolist() == pytest.approx([0.5] * 4)
+    assert contained == 0
+
+
+def test_invalid_bow_tie_is_repaired(overlay):
+    bow_tie = shapely.to_wkb(shapely.Polygon([(0, 0), (2, 1), (2, 0), (0, 1), (0, 0)]))
+    assert not shapely.is_valid(shapely.from_wkb(bow_tie))
+    input_positions, overlay_positions, wkbs, areas, contained = overlay.intersect([bow_tie])
+    assert overlay.overlay_fids[overlay_positions].tolist() == [10, 20]
+    # make_valid splits the bow tie into two triangles of area 0.5, one in each square
+    assert areas.tolist() == pytest.approx([0.5, 0.5])
+
+
+def test_weighted_sums():
+    input_positions = np.array([0, 0, 1, 2])
+    overlay_values = np.array([2.0, np.nan, 3.0, np.nan])
+    areas = np.array([0.25, 0.5, 2.0, 1.0])
+    sums = weightedSums(input_positions, overlay_values, areas, 4)
+    np.testing.assert_allclose(sums, [0.5, 6.0, np.nan, np.nan])
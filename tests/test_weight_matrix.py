@@ -0,0 +1,43 @@
+import numpy as np
+
+from weight_matrix import WeightMatrixBuilder, applyWeights, loadWeightMatrix
+
+
+def buildMatrix(path):
+    builder = WeightMatrixBuilder([20, 10])
+    builder.addRow(1, 4.0, [(20, 1.0), (10, 3.0)])
+    # input feature 2 is skipped, 4 comes after the last row
+    builder.addRow(3, 2.0, [(10, 2.0)])
+    builder.save(path, [101, 102, 103, 104], "")
+    return loadWeightMatrix(path)
+
+
+def test_add_row_fills_gaps(tmp_path):
+    matrix = buildMatrix(str(tmp_path / "weights.npz"))
+    assert matrix["indptr"].tolist() == [0, 2, 2, 3, 3]
+    assert matrix["indices"].tolist() == [0, 1, 0]
+    assert matrix["data"].tolist() == [3.0, 1.0, 2.0]
+    assert matrix["overlay_fids"].tolist() == [10, 20]
+    assert matrix["input_fids"].tolist() == [101, 102, 103, 104]
+    np.testing.assert_array_equal(matrix["input_area"], [4.0, np.nan, 2.0, np.nan])
+
+
+def test_apply_weights_skips_null_columns(tmp_path):
+    matrix = buildMatrix(str(tmp_path / "weights.npz"))
+    average = applyWeights(matrix, np.array([1.0, np.nan]))
+    np.testing.assert_allclose(average, [0.75, np.nan, 1.0, np.nan])
+
+
+def test_apply_weights_null_everywhere(tmp_path):
+    matrix = buildMatrix(str(tmp_path / "weights.npz"))
+    assert np.isnan(applyWeights(matrix, np.array([np.nan, np.nan]))).all()
+
+
+def test_apply_weights_empty_and_zero_area_rows():
+    matrix = {
+        "indptr": np.array([0, 0, 1]),
+        "indices": np.array([0]),
+        "data": np.array([2.0]),
+        "input_area": np.array([5.0, 0.0]),
+    }
+    assert np.isnan(applyWeights(matrix, np.array([3.0]))).all()
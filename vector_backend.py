@@ -0,0 +1,100 @@
+__revision__ = "$Format:%H$"
+
+import numpy as np
+
+
+def importShapely():
+    """Shapely 2 module, ImportError if it is missing or older than 2.0"""
+    import shapely
+
+    if int(shapely.__version__.split(".")[0]) < 2:
+        raise ImportError(f"Shapely 2.0 or later is needed, {shapely.__version__} is installed")
+    return shapely
+
+
+def validGeometries(shapely, geoms):
+    """
+    Repair the invalid geometries of a Shapely array with make_valid, in place, so that the bulk
+    intersection does not raise a GEOSException for a single self-intersecting polygon.
+    """
+    invalid = ~shapely.is_valid(geoms) & ~shapely.is_missing(geoms)
+    if invalid.any():
+        geoms[invalid] = shapely.make_valid(geoms[invalid])
+    return geoms
+
+
+class VectorOverlay:
+    """
+    Overlay geometries held as a Shapely array with an STRtree, intersected in bulk with blocks of
+    input geometries. Geometries go in and out as WKB, only the pieces that are used are converted
+    back to QGIS geometries.
+    """
+
+    def __init__(self, overlay_fids, overlay_wkbs):
+        self.shapely = importShapely()
+        self.overlay_fids = np.asarray(overlay_fids, dtype=np.int64)
+        self.overlay_geoms = validGeometries(self.shapely, self.shapely.from_wkb(overlay_wkbs))
+        self.tree = self.shapely.STRtree(self.overlay_geoms)
+
+    def __len__(self):
+        return len(self.overlay_fids)
+
+    def overlayValues(self, value_of_fid):
+        """Array of a numeric overlay value per overlay geometry, NaN where it is NULL"""
+        values = [value_of_fid(fid) for fid in self.overlay_fids.tolist()]
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+    def intersect(self, input_wkbs):
+        """
+        Intersect a block of input geometries, None where there is none, with the overlay. Returns
+        the input positions, overlay positions, WKB and areas of the pieces with a positive area,
+        sorted by input position and overlay fid like clipPieces, and the number of input
+        geometries that needed no intersection: like clipPieces, an input geometry within an
+        overlay geometry is its own piece and the overlay geometries that only touch it are skipped.
+        Invalid geometries are repaired with make_valid first.
+        """
+        shapely = self.shapely
+        input_geoms = validGeometries(shapely, shapely.from_wkb(np.array(input_wkbs, dtype=object)))
+        shapely.prepare(input_geoms)
+
+        input_positions, overlay_positions = self.tree.query(input_geoms, predicate="intersects")
+        within = shapely.within(input_geoms[input_positions], self.overlay_geoms[overlay_positions])
+        # next to an overlay geometry an input geometry is within, the neighbours that only touch it are dropped
+        has_within = np.bincount(input_positions, weights=within, minlength=len(input_geoms)) > 0
+        touching = ~within & has_within[input_positions]
+        touching[touching] = ~shapely.relate_pattern(
+            input_geoms[input_positions[touching]], self.overlay_geoms[overlay_positions[touching]], "T********"
+        )
+        input_positions = input_positions[~touching]
+        overlay_positions = overlay_positions[~touching]
+        within = within[~touching]
+        pieces = input_geoms[input_positions]
+        pieces[~within] = shapely.intersection(pieces[~within], self.overlay_geoms[overlay_positions[~within]])
+        hits = np.bincount(input_positions, minlength=len(input_geoms))
+        clipped = np.bincount(input_positions[~within], minlength=len(input_geoms))
+        contained = int(np.count_nonzero((hits > 0) & (clipped == 0)))
+        # lines and points of the intersection have no area, as in polygonalPart
+        areas = shapely.area(pieces)
+        keep = areas > 0
+        input_positions = input_positions[keep]
+        overlay_positions = overlay_positions[keep]
+        order = np.lexsort((self.overlay_fids[overlay_positions], input_positions))
+        return (
+            input_positions[order],
+            overlay_positions[order],
+            shapely.to_wkb(pieces[keep][order]),
+            areas[keep][order],
+            contained,
+        )
+
+
+def weightedSums(input_positions, overlay_values, areas, input_count):
+    """
+    Area weighted sum of one overlay value per input position with bincount, NaN where no piece
+    has a value. overlay_values holds the value of the overlay feature of each piece.
+    """
+    valid = ~np.isnan(overlay_values)
+    sums = np.bincount(input_positions, weights=np.where(valid, overlay_values * areas, 0.0), minlength=input_count)
+    counts = np.bincount(input_positions, weights=valid, minlength=input_count)
+    sums[counts == 0] = np.nan
+    return sums
@@ -0,0 +1,76 @@
+"""
+Sparse input x overlay areal weight matrix. Rows follow input_feat_id (input layer iteration order),
+columns follow overlay feature ids and values are the areas of the clipped pieces, stored in CSR form
+in a NumPy .npz archive.
+"""
+
+from array import array
+
+import numpy as np
+
+
+class WeightMatrixBuilder:
+    """Accumulates the rows of the weight matrix while the fast engine clips the input layer"""
+
+    def __init__(self, overlay_fids):
+        self.overlay_fids = np.array(sorted(overlay_fids), dtype=np.int64)
+        self.columns = {overlay_fid: column for column, overlay_fid in enumerate(self.overlay_fids.tolist())}
+        self.indptr = array("q", [0])
+        self.indices = array("q")
+        self.data = array("d")
+        self.input_areas = {}
+
+    def addRow(self, input_feat_id, input_area, piece_areas):
+        """piece_areas is a list of (overlay fid, area). Rows of skipped input features stay empty"""
+        while len(self.indptr) < input_feat_id:
+            self.indptr.append(len(self.indices))
+        for overlay_fid, area in sorted(piece_areas):
+            self.indices.append(self.columns[overlay_fid])
+            self.data.append(area)
+        self.indptr.append(len(self.indices))
+        self.input_areas[input_feat_id] = input_area
+
+    def save(self, path, input_fids, crs_wkt):
+        while len(self.indptr) < len(input_fids) + 1:
+            self.indptr.append(len(self.indices))
+        input_area = np.array(
+            [self.input_areas.get(input_feat_id, np.nan) for input_feat_id in range(1, len(input_fids) + 1)],
+            dtype=np.float64,
+        )
+        np.savez_compressed(
+            path,
+            indptr=np.frombuffer(self.indptr, dtype=np.int64),
+            indices=np.frombuffer(self.indices, dtype=np.int64),
+            data=np.frombuffer(self.data, dtype=np.float64),
+            input_fids=np.array(input_fids, dtype=np.int64),
+            input_area=input_area,
+            overlay_fids=self.overlay_fids,
+            crs=np.array(crs_wkt),
+        )
+
+
+def loadWeightMatrix(path):
+    with np.load(path) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def applyWeights(matrix, values):
+    """
+    Area weighted average of one overlay attribute for every row of the matrix, as a sparse
+    matrix-vector product. values holds one float per column, NaN for NULL. Rows without any
+    non-NULL piece get NaN, like the NULL of the geometric path.
+    """
+    indptr = matrix["indptr"]
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    piece_values = values[matrix["indices"]]
+    valid = ~np.isnan(piece_values)
+
+    weighted_sum = np.bincount(
+        rows[valid], weights=matrix["data"][valid] * piece_values[valid], minlength=len(indptr) - 1
+    )
+    has_value = np.bincount(rows[valid], minlength=len(indptr) - 1) > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average = weighted_sum / matrix["input_area"]
+    average[~has_value | ~(matrix["input_area"] > 0)] = np.nan
+    return average